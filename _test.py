@@ -1,26 +1,80 @@
 import pytest
+import io
 import json
+import os
+import sys
+# общие модули (разметка, граф, колонки, ...) - в одном экземпляре в api/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
 from analysis import PageRank, BetweennessCentralityRank, InfluencerTable, InfluencerTableNegative, Telegram, Vkontakte
 from model import Model
-import os
+from sentiment import get_classifier, token_batches
+from sentiment_cache import SentimentCache
+from graph import InteractionGraph, get_graph
+from crawl_index import CrawlIndex
+from columns import get_columns
+from crawl_stream import load_crawl, load_columns
+from crawl_cache import CrawlCache, estimate_size
+from crawl_codec import MAGIC, decode, encode, header, read_columns, read_crawl
+from rendering import render_key, submit
+from graph_layout import neighbourhood, multilevel_layout
+from centrality import parallel_betweenness
+from topk import top_k, TopK
+from pagerank import ALPHA, TOL, IncrementalPageRank, apply_delta
+import networkx as nx
 
 
 @pytest.fixture
 def test_data():
     file_path = os.path.join(os.getcwd(), 'data/data.json') 
     with open(file_path, 'r') as file:
-        file_content = file.read()
-    return json.loads(file_content)
+        return load_crawl(file)
 
 
 @pytest.fixture
 def test_text():
     file_path = os.path.join(os.getcwd(), 'data/new_data.txt')  
     with open(file_path, 'r') as file:
-        file_content = file.read()
-    return json.loads(file_content)
+        return load_crawl(file)
     
 
+class TestSentiment:
+    '''
+    Проверка общего классификатора тональности
+    '''
+    def test_get_classifier_shared(self):
+        assert get_classifier() is get_classifier()
+
+    def test_token_batches(self):
+        texts = ['👍', 'Очень вкусно', 'Длинный отзыв ' * 40, 'Спасибо']
+        lengths = [3, 5, 300, 4]
+        batches = list(token_batches(texts, lengths, token_budget=16, batch_size=8))
+        assert batches == [['👍', 'Спасибо', 'Очень вкусно'], ['Длинный отзыв ' * 40]]
+
+
+class TestSentimentCache:
+    '''
+    Проверка дискового кеша тональности
+    '''
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return SentimentCache(str(tmp_path), max_size=2)
+
+    def test_hits_and_misses(self, cache):
+        cache.put_many({'Отлично': {'label': 'POSITIVE', 'score': 0.9}}, 'model')
+        found = cache.get_many(['Отлично', ' Отлично ', 'Плохо'], 'model')
+        assert found['Отлично'] == found[' Отлично '] == {'label': 'POSITIVE', 'score': 0.9}
+        assert 'Плохо' not in found
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+        assert cache.get_many(['Отлично'], 'other-model') == {}
+
+    def test_eviction(self, cache):
+        cache.put_many({'a': {'label': 'NEUTRAL', 'score': 0.5}, 'b': {'label': 'NEUTRAL', 'score': 0.5}}, 'model')
+        cache.get_many(['a'], 'model')
+        cache.put_many({'c': {'label': 'NEUTRAL', 'score': 0.5}}, 'model')
+        assert set(cache.get_many(['a', 'b', 'c'], 'model')) == {'a', 'c'}
+        assert cache.stats()['size'] == 2
+
+
 class TestTelegram:
     '''
     Проверка ожидаемого значения для класса Telegram
@@ -91,6 +145,542 @@ class TestVkontakte:
         assert len(top_emoji.keys()) == 5
 
 
+class TestTopK:
+    '''
+    Проверка выбора топ-k
+    '''
+    def test_top_k_stable(self):
+        items = [(i, i % 7) for i in range(1000)]
+        expected = sorted(items, key=lambda x: x[1], reverse=True)[:25]
+        assert top_k(items, 25, key=lambda x: x[1]) == expected
+
+        stream = TopK(25, key=lambda x: x[1])
+        stream.extend(items)
+        assert stream.items() == expected
+        assert len(stream) == 25
+
+
+class TestCrawlIndex:
+    '''
+    Проверка индекса кейса
+    '''
+    def test_replies_of(self, test_text):
+        index = CrawlIndex(test_text)
+        sender_id = test_text['vk'][0]['posts'][0]['replies'][0]['sender_id']
+        expected = [reply for post in test_text['vk'][0]['posts'] for reply in post['replies'] if reply['sender_id'] == sender_id]
+        assert index.replies_of(sender_id) == expected
+        assert index.replies_of('unknown') == []
+
+    def test_edges(self, test_text):
+        index = CrawlIndex(test_text)
+        connections = [(post['from']['id'], reply['sender_id']) for post in test_text['vk'][0]['posts'] if post['from'] is not None for reply in post['replies']]
+        assert [(index.ids[u], index.ids[v]) for u, v in zip(index.sources, index.targets)] == connections
+        assert [index.ids[i] for i in index.nodes()] == list(dict.fromkeys(node for edge in connections for node in edge))
+
+
+class TestColumns:
+    '''
+    Проверка колоночного представления кейса
+    '''
+    def test_reactions(self, test_data):
+        group = test_data[0]['tg'][0]
+        columns = get_columns(group)
+        assert columns.reactions().tolist() == [sum(reaction['count'] for reaction in post['reactions']) for post in group['posts']]
+        assert columns.reactions('❤').tolist() == [sum(reaction['count'] for reaction in post['reactions'] if reaction['emoji'] == '❤') for post in group['posts']]
+        assert columns.first_reaction().tolist() == [post['reactions'][0]['count'] if post['reactions'] else 0 for post in group['posts']]
+        assert get_columns(group) is columns
+
+    def test_replies(self, test_text):
+        group = test_text['vk'][0]
+        columns = get_columns(group)
+        replies = [reply for post in group['posts'] for reply in post['replies']]
+        assert columns.reply_count().tolist() == [len(post['replies']) for post in group['posts']]
+        assert [columns.reply_text(j) for j in range(len(replies))] == [reply['text'] for reply in replies]
+        assert columns.unique_senders() == len(set(reply['sender_id'] for reply in replies))
+        assert columns.unique_senders_per_post().tolist() == [len(set(reply['sender_id'] for reply in post['replies'])) for post in group['posts']]
+
+
+class TestCrawlStream:
+    '''
+    Проверка потокового чтения кейса
+    '''
+    @pytest.mark.parametrize('chunk_size', [1, 7, 65536])
+    def test_load_crawl(self, chunk_size):
+        for name in ('data/data.json', 'data/text.txt'):
+            with open(name, 'r') as file:
+                expected = json.load(file)
+            with open(name, 'r') as file:
+                assert load_crawl(file, chunk_size) == expected
+            # бинарный поток: куски режут многобайтовые символы utf-8
+            content = json.dumps(expected, ensure_ascii=False).encode('utf-8')
+            assert load_crawl(io.BytesIO(content), chunk_size) == expected
+
+    def test_load_columns(self, test_text):
+        with open('data/new_data.txt', 'r') as file:
+            crawl = load_columns(file, 4096)
+        group, expected = crawl['vk'][0], test_text['vk'][0]
+        assert 'posts' not in group
+        assert group == {key: value for key, value in expected.items() if key != 'posts'}
+        # колонки хранятся вне словарей кейса - кейс по-прежнему сериализуется в JSON
+        assert json.loads(json.dumps(crawl))['vk'][0] == group
+        json.dumps(expected)
+        assert get_columns(group).reactions().tolist() == get_columns(expected).reactions().tolist()
+        assert get_columns(group).unique_senders() == get_columns(expected).unique_senders()
+
+
+class TestCrawlCodec:
+    '''
+    Проверка форматов хранения кейса
+    '''
+    def test_legacy_json(self, test_text):
+        with open('data/new_data.txt', 'rb') as file:
+            payload = file.read()
+        assert header(payload) == ('json', 'none')
+        assert decode(payload) == test_text
+        assert read_crawl(io.BytesIO(payload), 1000) == test_text
+
+    @pytest.mark.parametrize('format, compression', [('json', 'none'), ('json', 'zlib'), ('json', 'zstd'), ('json', 'lz4'),
+                                                     ('msgpack', 'none'), ('msgpack', 'zstd')])
+    def test_round_trip(self, test_text, format, compression):
+        module = {'zstd': 'zstandard', 'lz4': 'lz4'}.get(compression)
+        if module:
+            pytest.importorskip(module)
+        if format == 'msgpack':
+            pytest.importorskip('msgpack')
+
+        payload = encode(test_text, format, compression)
+        assert header(payload) == (format, compression)
+        assert payload.startswith(MAGIC) == ((format, compression) != ('json', 'none'))
+        assert decode(payload) == test_text
+        assert read_crawl(io.BytesIO(payload), 1000) == test_text
+        columns = read_columns(io.BytesIO(payload), 1000)
+        assert get_columns(columns['vk'][0]).reactions().tolist() == get_columns(test_text['vk'][0]).reactions().tolist()
+
+
+@pytest.fixture
+def redis_server():
+    '''
+    Локальная замена Redis (fakeredis по TCP) - клиенты подключаются к ней так же, как к настоящему серверу
+    '''
+    fakeredis = pytest.importorskip('fakeredis')
+    import threading
+    server = fakeredis.TcpFakeServer(('127.0.0.1', 0), server_type='redis')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+class TestRedis:
+    '''
+    Проверка доступа к Redis
+    '''
+    def test_get_set(self, redis_server, test_text):
+        from api_redis import make_client, redis_columns, redis_get, redis_set
+        client = make_client(*redis_server, max_connections=2)
+        redis_set('crawl', test_text, 'json', 'zlib', client=client)
+        assert redis_get('crawl', client) == test_text
+        assert get_columns(redis_columns('crawl', client)['vk'][0]).unique_senders() == get_columns(test_text['vk'][0]).unique_senders()
+        with pytest.raises(KeyError):
+            redis_get('unknown', client)
+
+    def test_legacy_value(self, redis_server, test_text):
+        from api_redis import make_client, redis_get
+        client = make_client(*redis_server)
+        with open('data/new_data.txt', 'rb') as file:
+            client.set('crawl', file.read())
+        assert redis_get('crawl', client) == test_text
+
+    def test_get_cached(self, redis_server, test_data):
+        from api_redis import make_client, redis_get_cached, redis_set
+        client = make_client(*redis_server)
+        cache = CrawlCache()
+        redis_set('a', test_data, client=client)
+        crawl = redis_get_cached('a', client, cache)
+        assert crawl == test_data
+        assert redis_get_cached('a', client, cache) is crawl
+
+        # перезапись через redis_set меняет номер версии
+        redis_set('a', test_data[0], client=client)
+        assert redis_get_cached('a', client, cache) == test_data[0]
+
+        # ключ без номера версии, записанный напрямую - метка по длине значения
+        client.set('b', json.dumps(test_data))
+        crawl = redis_get_cached('b', client, cache)
+        assert crawl == test_data
+        assert redis_get_cached('b', client, cache) is crawl
+        client.set('b', json.dumps(test_data[0]))
+        assert redis_get_cached('b', client, cache) == test_data[0]
+
+    def test_get_cached_same_length_edit(self, redis_server):
+        from api_redis import VERSION_SUFFIX, make_client, redis_get_cached
+        client = make_client(*redis_server)
+        now = [0]
+        cache = CrawlCache(ttl=10, clock=lambda: now[0])
+        # изменение в середине значения той же длины (число лайков 12 -> 13)
+        template = json.dumps({'vk': [{'posts': [{'text': 'x' * 10000, 'likes': 0, 'tail': 'y' * 10000}]}]})
+        client.set('c', template.replace('"likes": 0', '"likes": 12'))
+        assert redis_get_cached('c', client, cache)['vk'][0]['posts'][0]['likes'] == 12
+        client.set('c', template.replace('"likes": 0', '"likes": 13'))
+        # без номера версии - до истечения срока хранения
+        assert redis_get_cached('c', client, cache)['vk'][0]['posts'][0]['likes'] == 12
+        now[0] = 10
+        assert redis_get_cached('c', client, cache)['vk'][0]['posts'][0]['likes'] == 13
+        # с номером версии, увеличенным краулером - сразу
+        client.set('c', template.replace('"likes": 0', '"likes": 14'))
+        client.incr('c' + VERSION_SUFFIX)
+        assert redis_get_cached('c', client, cache)['vk'][0]['posts'][0]['likes'] == 14
+
+    def test_read_snapshot(self, redis_server, test_data):
+        from api_redis import make_client, redis_read, redis_set
+        client = make_client(*redis_server)
+        writer = make_client(*redis_server)
+        redis_set('a', test_data, client=client)
+        calls = []
+
+        def read(stream):
+            # значение перезаписывается другим клиентом посреди первого чтения
+            chunk = stream.read(100)
+            if not calls:
+                redis_set('a', test_data[0], client=writer)
+            calls.append(1)
+            return json.loads(chunk + stream.read())
+
+        version, size, crawl = redis_read('a', read, client)
+        assert crawl == test_data[0]
+        assert len(calls) == 2
+        assert size == client.strlen('a')
+
+    def test_get_many(self, redis_server, test_data):
+        from api_redis import make_client, redis_get_many, redis_set
+        client = make_client(*redis_server, max_connections=1)
+        redis_set('a', test_data[0], client=client)
+        redis_set('b', test_data, 'json', 'zlib', client=client)
+        assert redis_get_many(['b', 'unknown', 'a'], client) == [test_data, None, test_data[0]]
+
+    def test_async(self, redis_server, test_data):
+        import asyncio
+        from api_redis import make_async_client, make_client, redis_get_async, redis_get_many_async, redis_set
+        redis_set('a', test_data, 'json', 'zlib', client=make_client(*redis_server))
+
+        async def read():
+            client = make_async_client(*redis_server, max_connections=2)
+            try:
+                crawls = await asyncio.gather(*(redis_get_async('a', client) for _ in range(5)))
+                many = await redis_get_many_async(['a', 'unknown'], client)
+                with pytest.raises(KeyError):
+                    await redis_get_async('unknown', client)
+            finally:
+                await client.aclose()
+            return crawls, many
+
+        crawls, many = asyncio.run(read())
+        assert crawls == [test_data] * 5
+        assert many == [test_data, None]
+
+    def test_async_default_client(self, redis_server, test_data, monkeypatch):
+        import asyncio
+        import api_redis
+        make_async_client = api_redis.make_async_client
+        monkeypatch.setattr(api_redis, 'make_async_client', lambda: make_async_client(*redis_server))
+        api_redis.redis_set('a', test_data, client=api_redis.make_client(*redis_server))
+
+        # клиент без явной передачи - свой в каждом цикле событий
+        async def read():
+            return await api_redis.redis_get_async('a'), api_redis.get_async_client()
+
+        first, first_client = asyncio.run(read())
+        second, second_client = asyncio.run(read())
+        assert first == second == test_data
+        assert first_client is not second_client
+
+
+class TestAnnotation:
+    '''
+    Проверка однократной разметки кейса
+    '''
+    def test_crawls_annotated_in_parallel(self, test_text, monkeypatch):
+        import threading
+        import annotation
+        other = json.loads(json.dumps(test_text))
+        started, release = threading.Event(), threading.Event()
+
+        def annotate(texts):
+            started.set()
+            release.wait(5)
+            return {}
+
+        monkeypatch.setattr(annotation, 'annotate', annotate)
+        thread = threading.Thread(target=annotation.annotate_crawl, args=(test_text,))
+        thread.start()
+        assert started.wait(5)
+        # пока размечается тональность одного кейса, другой кейс размечается без ожидания
+        annotation.annotate_crawl(other, sentiment=False)
+        assert thread.is_alive()
+        release.set()
+        thread.join()
+        assert 'structure' in other['vk'][0]['annotations']
+        assert not annotation._locks
+
+
+class TestApi:
+    '''
+    Проверка эндпоинтов API на кейсе data/new_data.txt как есть (сообщества vk и tg)
+    '''
+    @pytest.fixture
+    def crawl(self, test_text, monkeypatch):
+        pytest.importorskip('flask')
+        pytest.importorskip('flask_cors')
+        import api
+        monkeypatch.setattr(api, 'redis_get_cached', lambda key: test_text)
+        return test_text
+
+    def post(self, endpoint, **fields):
+        import api
+        return api.app.test_client().post(endpoint, data=json.dumps(dict({'crawlingId': 'crawl', 'groupId': 0}, **fields)))
+
+    def test_endpoints(self, crawl):
+        tg_sentiment = [post.get('sentiment') for group in crawl['tg'] for post in group['posts']]
+        assert self.post('/post_involvement_analysis').status_code == 200
+        assert self.post('/influencers_analysis').status_code == 200
+        response = self.post('/brand_rating', weights=[100 / 11] * 11)
+        assert response.status_code == 200
+        assert set(response.get_json()) == {'rating', 'weakness'}
+        # поле sentiment краулера не перезаписывается разметкой
+        assert [post.get('sentiment') for group in crawl['tg'] for post in group['posts']] == tg_sentiment
+        assert all('annotated_sentiment' in post for group in crawl['vk'] for post in group['posts'])
+
+
+class TestCrawlCache:
+    '''
+    Проверка кеша разобранных кейсов
+    '''
+    def test_eviction(self):
+        cache = CrawlCache(max_size=2, max_bytes=100, ttl=60)
+        cache.put('a', 1, {'id': 'a'}, 10)
+        cache.put('b', 1, {'id': 'b'}, 10)
+        assert cache.get('a', 1) == {'id': 'a'}
+        cache.put('c', 1, {'id': 'c'}, 10)
+        # вытесняется давно не использованный кейс
+        assert cache.get('b', 1) is None
+        # суммарный размер больше max_bytes
+        cache.put('d', 1, {'id': 'd'}, 85)
+        assert cache.get('a', 1) is None
+        assert cache.get('c', 1) == {'id': 'c'} and cache.get('d', 1) == {'id': 'd'}
+        cache.put('e', 1, {'id': 'e'}, 101)
+        assert cache.get('e', 1) is None
+
+    def test_version_and_ttl(self):
+        now = [0]
+        cache = CrawlCache(ttl=10, clock=lambda: now[0])
+        cache.put('a', 'v1', {}, 1)
+        assert cache.get('a', 'v2') is None
+        assert cache.get('a', 'v1') is None
+        cache.put('a', 'v1', {}, 1)
+        now[0] = 9
+        assert cache.get('a', 'v1') == {}
+        now[0] = 10
+        assert cache.get('a', 'v1') is None
+
+    def test_estimated_size(self, test_text):
+        small = {'vk': [{'posts': [{'text': 'a'}]}]}
+        cache = CrawlCache(max_bytes=estimate_size(test_text) + estimate_size(small))
+        cache.put('a', 1, test_text)
+        cache.put('b', 1, small)
+        assert cache.stats()['bytes'] == estimate_size(test_text) + estimate_size(small)
+        # размер - по разобранному кейсу (с запасом на разметку), а не по длине значения в Redis
+        assert estimate_size(test_text) > os.path.getsize('data/new_data.txt')
+        cache.put('c', 1, small)
+        assert cache.get('a', 1) is None
+
+    def test_get_or_load(self):
+        import threading
+        cache = CrawlCache()
+        calls = []
+        started = threading.Event()
+
+        def load():
+            calls.append(1)
+            started.wait(5)
+            return 1, {'id': 'a'}
+
+        threads = [threading.Thread(target=lambda: cache.get_or_load('a', 1, load)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert cache.get_or_load('a', 1, load) == {'id': 'a'}
+        assert len(calls) == 1
+
+
+class TestRendering:
+    '''
+    Проверка фоновой отрисовки картинок графа
+    '''
+    def test_submit_cached(self, tmp_path):
+        calls = []
+
+        def draw(path):
+            calls.append(path)
+            with open(path, 'wb') as f:
+                f.write(b'png')
+
+        path = submit('key', draw, str(tmp_path)).result(timeout=10)
+        assert submit('key', draw, str(tmp_path)).result(timeout=10) == path
+        assert len(calls) == 1
+        assert open(path, 'rb').read() == b'png'
+        assert os.listdir(tmp_path) == ['key.png']
+
+
+    def test_render_key_labels(self):
+        key = render_key('edges', 'pagerank', 2, [(1, 'Иван Петров'), (2, 'Анна Смирнова')])
+        assert key == render_key('edges', 'pagerank', 2, [(1, 'Иван Петров'), (2, 'Анна Смирнова')])
+        # те же ребра, но пользователь сменил имя - картинка рисуется заново
+        assert key != render_key('edges', 'pagerank', 2, [(1, 'Иван Сидоров'), (2, 'Анна Смирнова')])
+
+
+class TestGraphLayout:
+    '''
+    Проверка раскладки больших графов
+    '''
+    def test_neighbourhood(self, test_text):
+        graph = get_graph(test_text)
+        pagerank = graph.pagerank()
+        nodes = neighbourhood(graph.G, pagerank, 5, max_nodes=30)
+        top = sorted(pagerank, key=pagerank.get, reverse=True)[:5]
+        assert len(nodes) == 30
+        assert nodes[:5] == top
+
+    def test_multilevel_layout(self, test_text):
+        graph = get_graph(test_text)
+        pos = multilevel_layout(graph.G)
+        assert list(pos) == list(graph.G)
+
+
+class TestInteractionGraph:
+    '''
+    Проверка общего графа взаимодействий
+    '''
+    def test_graph_shared(self, test_text):
+        graph = get_graph(test_text)
+        assert get_graph(test_text) is graph
+        assert graph.pagerank() is graph.pagerank()
+        assert abs(sum(graph.pagerank().values()) - 1) < 1e-6
+        assert set(graph.sender_id) == set(graph.G.nodes())
+        # граф хранится вне кейса - кейс по-прежнему сериализуется в JSON
+        assert json.loads(json.dumps(test_text)) == test_text
+
+    def test_released_with_crawl(self):
+        import weakref
+        with open('data/new_data.txt', 'r') as file:
+            crawl = load_crawl(file)
+        graph, columns = get_graph(crawl), get_columns(crawl['vk'][0])
+        assert crawl.graph is graph and crawl['vk'][0].columns is columns
+        # граф и колонки живут, пока жив кейс: кеши производных объектов его не удерживают
+        ref = weakref.ref(crawl)
+        del crawl, graph, columns
+        assert ref() is None
+
+    def test_centrality_computed_once(self, test_text, monkeypatch):
+        import threading
+        import time
+        calls = []
+        betweenness = nx.betweenness_centrality
+
+        def slow_betweenness(G, **kwargs):
+            calls.append(1)
+            time.sleep(0.1)
+            return betweenness(G, **kwargs)
+
+        monkeypatch.setattr(nx, 'betweenness_centrality', slow_betweenness)
+        graph = get_graph(test_text)
+        threads = [threading.Thread(target=graph.betweenness) for _ in range(4)]
+        threads += [threading.Thread(target=graph.pagerank) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert graph.pagerank() is graph.pagerank()
+
+    def test_degree(self, test_text):
+        graph = get_graph(test_text)
+        for user_id in graph.sender_id[:20]:
+            assert graph.degree(user_id) == sum(1 for edge in graph.connections if user_id in edge)
+
+    def test_parallel_betweenness(self, test_text):
+        graph = get_graph(test_text)
+        centrality, info = parallel_betweenness(graph.G, workers=2)
+        expected = nx.betweenness_centrality(graph.G)
+        assert all(abs(centrality[k] - v) < 1e-9 for k, v in expected.items())
+        assert info['workers'] == 2
+
+    def test_sparse_pagerank(self, test_text):
+        graph = get_graph(test_text)
+        expected = nx.pagerank(graph.G, weight=None)
+        assert all(abs(graph.pagerank()[k] - v) < 1e-6 for k, v in expected.items())
+
+    def test_weighted_edges(self, test_text):
+        graph = get_graph(test_text)
+        assert sum(w for u, v, w in graph.weighted_edges()) == len(graph.connections)
+        assert graph.G.number_of_edges() == len(graph.weighted_edges())
+        expected = nx.pagerank(graph.G, weight='weight')
+        assert all(abs(graph.pagerank(weighted=True)[k] - v) < 1e-6 for k, v in expected.items())
+
+    def test_incremental_pagerank(self, test_text):
+        graph = get_graph(test_text)
+        ranker = IncrementalPageRank(graph.sender_id, graph.connections, tol=1e-10)
+        ranker.ranks()
+        added, removed = [(graph.sender_id[0], 'new_sender')], graph.connections[:20]
+        result = ranker.update(added, removed)
+
+        G = nx.DiGraph(apply_delta(graph.connections, added, removed))
+        expected = nx.pagerank(G, tol=1e-10)
+        assert set(result) == set(expected)
+        assert all(abs(result[k] - v) < 1e-6 for k, v in expected.items())
+
+    def test_update(self, test_text):
+        from collections import Counter
+        graph = InteractionGraph(test_text)
+        previous = nx.pagerank(graph.G, weight=None, tol=1e-10)
+        graph.pagerank()
+        graph.degree(graph.sender_id[0])
+        graph.weighted_edges()
+        added = [(graph.sender_id[0], 'new_sender'), (graph.sender_id[1], graph.sender_id[2])]
+        removed = graph.connections[:20]
+        edges = apply_delta(graph.connections, added, removed)
+        graph.update(added, removed, {'new_sender': {'first_name': 'Новый', 'last_name': 'Пользователь'}})
+
+        # граф после update() совпадает с графом, построенным заново по новым ребрам
+        G = nx.DiGraph(edges)
+        assert set(graph.sender_id) == set(G)
+        assert graph.sender_info['new_sender']['first_name'] == 'Новый'
+        assert all(graph.degree(node) == sum(1 for edge in edges if node in edge) for node in G)
+        assert set(graph.weighted_edges()) == {(u, v, w) for (u, v), w in Counter(edges).items()}
+        assert len(graph.weighted_edges()) == G.number_of_edges()
+        # степенной метод останавливается при изменении меньше n * TOL, ошибка - не больше n * TOL * ALPHA / (1 - ALPHA)
+        expected = nx.pagerank(G, tol=1e-10)
+        assert sum(abs(graph.pagerank()[k] - v) for k, v in expected.items()) < len(G) * TOL * ALPHA / (1 - ALPHA)
+
+        # теплый старт с pagerank прошлого краулинга сходится к тому же результату
+        warm = InteractionGraph(test_text).pagerank(previous=previous)
+        assert all(abs(warm[k] - v) < 1e-6 for k, v in previous.items())
+
+    def test_approximate_betweenness(self, test_text):
+        graph = get_graph(test_text)
+        exact = graph.betweenness_centrality()
+        approximate, info = graph.betweenness(mode='approximate', pivots=len(exact))
+        assert info['pivots'] <= len(exact)
+        if info['pivots'] == len(exact):
+            assert all(abs(exact[k] - approximate[k]) < 1e-9 for k in exact)
+
+        assert graph.betweenness(mode='approximate', epsilon=0.1)[1]['mode'] == 'approximate'
+        # параметры прошлого расчета не подменяются более поздним расчетом с другими параметрами
+        assert graph.betweenness()[1]['mode'] == 'exact'
+
+
 class TestPageRank:
     '''
     Проверка ожидаемого значения для класса PageRank
@@ -165,6 +755,16 @@ class TestModel:
         assert isinstance(metric_value, (int, float)) 
         assert 0 <= metric_value <= 1
     
+    def test_user_engagement_ratio_silent_post(self, test_text):
+        '''
+        Пост без комментариев, репостов и реакций не дает nan
+        '''
+        post = dict(test_text['vk'][0]['posts'][0], id=-1, replies=[], forwards=0, reactions=[])
+        test_text['vk'][0]['posts'].append(post)
+        ratio = Model(test_text).user_engagement_ratio()
+
+        assert ratio == ratio and 0 <= ratio <= 1
+
     @pytest.mark.parametrize("weight", [tuple((100 / 11) for _ in range(11)),
                                       tuple((10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 0.0)), 
                                       tuple((11.11, 0.0, 11.11, 11.11, 0.0, 11.11, 11.11, 11.11, 11.11, 11.11, 11.11)),
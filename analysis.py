@@ -1,11 +1,16 @@
-from transformers import pipeline
+import os
+import sys
+# общие модули (разметка, граф, колонки, ...) - в одном экземпляре в api/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+from sentiment import annotate
+from graph import get_graph
+from columns import get_columns
+from rendering import render_ranking
+from topk import top_k, top_items
 from collections import Counter
 from datetime import datetime
-import networkx as nx
-import matplotlib.pyplot as plt
 import json
 import emoji
-import os
 
 
 class Telegram:
@@ -22,8 +27,9 @@ class Telegram:
 
         for i in self.data:
             for j in i['tg']:
-                total_views += sum([0 if _["views"] is None else _["views"] for _ in j["posts"]])
-                total_likes += sum([reaction["count"] for post in j["posts"] for reaction in post["reactions"] if reaction["emoji"] == "❤"])
+                columns = get_columns(j)
+                total_views += int(columns.views.sum())
+                total_likes += int(columns.reactions('❤').sum())
 
         if total_views > 0 and total_likes > 0:
             love_rate = (total_likes / total_views) * 100
@@ -42,12 +48,11 @@ class Telegram:
         for i in self.data:
             for item in i['tg']:
                 followers = item['membersCount']
-                likes = sum(reaction['count'] for post in item['posts'] for reaction in post['reactions'])
-                reposts = sum(post['forwards'] for post in item['posts'])
+                columns = get_columns(item)
+                likes = int(columns.reaction_count.sum())
+                reposts = int(columns.forwards.sum())
 
-                unique_sender_ids = set(comment['sender_id'] for post in item['posts'] for comment in post.get('replies', []))
-
-                total_comments += len(unique_sender_ids)
+                total_comments += columns.unique_senders()
                 total_interactions += likes + total_comments + reposts
 
         if total_interactions > 0 and followers > 0:
@@ -67,14 +72,13 @@ class Telegram:
 
         for i in self.data:
             for item in i['tg']:
-                total_views += sum([0 if _["views"] is None else _["views"] for _ in item["posts"]])
+                columns = get_columns(item)
+                total_views += int(columns.views.sum())
                 
-                likes = sum(reaction['count'] for post in item['posts'] for reaction in post['reactions'])
-                reposts = sum(post.get('forwards', 0) for post in item['posts'])  
-
-                unique_sender_ids = set(comment['sender_id'] for post in item['posts'] for comment in post.get('replies', []))
+                likes = int(columns.reaction_count.sum())
+                reposts = int(columns.forwards.sum())
 
-                total_comments += len(unique_sender_ids)
+                total_comments += columns.unique_senders()
                 total_interactions += likes + total_comments + reposts
 
         if total_interactions > 0 and total_views > 0:
@@ -88,9 +92,6 @@ class Telegram:
         Топ-20 регионов с наибольшим числом пользователей
         [регион | пользователей | % | тональность]
         '''
-        # https://huggingface.co/blanchefort/rubert-base-cased-sentiment модель для анализа тональности
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-
         city_users = {}
 
         total_users = 0
@@ -105,13 +106,15 @@ class Telegram:
                         city_users[city].append(reply['sender_id'])
                         total_users += 1
 
+        sentiments = annotate(post['text'] for post in item['posts'] for post in post['replies'] if post['text'] is not None)
+
         city_stats = {}
         for city, users in city_users.items():
             users_count = len(users)
             percent = (users_count / total_users) * 100
 
             user_messages = [post['text'] for post in item['posts'] for post in post['replies'] if post.get('city') == city and post['text'] is not None]
-            classified_messages = classifier(user_messages)
+            classified_messages = [sentiments[message] for message in user_messages]
             len_messages = len(classified_messages)
             positive = len([i for i in classified_messages if i['label']=='POSITIVE']) / len_messages
             negative = len([i for i in classified_messages if i['label']=='NEGATIVE']) / len_messages
@@ -127,7 +130,7 @@ class Telegram:
             }
 
         # Оставляем топ-20, сортируем city_stats по users_count 
-        sorted_city_stats = dict(sorted(city_stats.items(), key=lambda x: x[1]['users_count'], reverse=True)[:20])
+        sorted_city_stats = dict(top_k(city_stats.items(), 20, key=lambda x: x[1]['users_count']))
 
         top_regions = json.dumps(sorted_city_stats, indent=4, ensure_ascii=False)
         return top_regions
@@ -137,15 +140,14 @@ class Telegram:
         Лояльность пользователей (Net Promoter Score)
         ((Положительные комментарии - Негативные комментарии) / Всего комментариев) * 100%
         """
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-
         for i in self.data:
             for item in i['vk']:
                 total_messages = [post['text'] for post in item['posts'] for post in post['replies'] if post['text'] is not None]
                 # print(total_messages)
                 len_total_messages = len(total_messages)
                 
-                classified_messages = classifier(total_messages)
+                sentiments = annotate(total_messages)
+                classified_messages = [sentiments[message] for message in total_messages]
                 positive_count = sum(1 for i in classified_messages if i['label'] == 'POSITIVE')
                 negative_count = sum(1 for i in classified_messages if i['label'] == 'NEGATIVE')
 
@@ -163,9 +165,6 @@ class Telegram:
         lists = []
         results = []
         
-        # https://huggingface.co/blanchefort/rubert-base-cased-sentiment модель для анализа тональности
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-        
         # диапазоны длин символов
         dict_lengths = {1: '0-10', 2: '11-50', 3: '51-100', 4: '101-200', 5: '201+'}
 
@@ -193,19 +192,20 @@ class Telegram:
                         else:
                             comments_lengths[dict_lengths[5]].append(reply['text'])
 
+        sentiments = annotate(text for texts in comments_lengths.values() for text in texts)
+
         for lengths in comments_lengths.keys():
-            lists.append([classifier(_) for _ in comments_lengths[lengths]])
+            lists.append([sentiments[_] for _ in comments_lengths[lengths]])
             
         length_keys = dict_lengths.values()
 
         for list in lists:
-            total_score = sum(dict['score'] for sublist in list for dict in sublist)
+            total_score = sum(dict['score'] for dict in list)
 
             distribution = {'positive': 0, 'negative': 0, 'neutral': 0} 
             if total_score != 0:
-                for sublist in list:
-                    for dict in sublist:
-                        distribution[dict['label'].lower()] += (dict['score'] / total_score) * 100
+                for dict in list:
+                    distribution[dict['label'].lower()] += (dict['score'] / total_score) * 100
 
             results.append(distribution)
 
@@ -235,7 +235,7 @@ class Telegram:
                         
                         reactions_summary[emoji] = reactions_summary.get(emoji, 0) + count
 
-        top_reactions = dict(sorted(reactions_summary.items(), key=lambda x: x[1], reverse=True)[:5])
+        top_reactions = dict(top_items(reactions_summary, 5))
         return top_reactions  
     
 
@@ -253,9 +253,10 @@ class Vkontakte:
 
         for i in self.data:
             for j in i['vk']:
-                valid_posts = [post for post in j["posts"] if post["views"] is not None] # только те посты, где просмотры != None
-                total_views += sum([post["views"] for post in valid_posts])
-                total_likes += sum([reaction["count"] for post in valid_posts for reaction in post["reactions"] if reaction["emoji"] == "like"])
+                columns = get_columns(j)
+                # только те посты, где просмотры != None (у остальных views = 0)
+                total_views += int(columns.views.sum())
+                total_likes += int(columns.reactions('like')[columns.has_views].sum())
 
         if total_views > 0 and total_likes > 0:
             love_rate = (total_likes / total_views) * 100
@@ -274,12 +275,11 @@ class Vkontakte:
         for i in self.data:
             for item in i['vk']:
                 followers = item['membersCount']
-                likes = sum(reaction['count'] for post in item['posts'] for reaction in post['reactions'])
-                reposts = sum(post['forwards'] for post in item['posts'])
-
-                unique_sender_ids = set(comment['sender_id'] for post in item['posts'] for comment in post.get('replies', []))
+                columns = get_columns(item)
+                likes = int(columns.reaction_count.sum())
+                reposts = int(columns.forwards.sum())
 
-                total_comments += len(unique_sender_ids)
+                total_comments += columns.unique_senders()
                 total_interactions += likes + total_comments + reposts
 
         if total_interactions > 0 and followers > 0:
@@ -293,9 +293,6 @@ class Vkontakte:
         Топ-20 регионов с наибольшим числом пользователей
         [регион | пользователей | % | тональность]
         '''
-        # https://huggingface.co/blanchefort/rubert-base-cased-sentiment модель для анализа тональности
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-
         city_users = {}
 
         total_users = 0
@@ -310,13 +307,15 @@ class Vkontakte:
                         city_users[city].append(reply['sender_id'])
                         total_users += 1
 
+        sentiments = annotate(post['text'] for post in item['posts'] for post in post['replies'] if post['text'] is not None)
+
         city_stats = {}
         for city, users in city_users.items():
             users_count = len(users)
             percent = (users_count / total_users) * 100
 
             user_messages = [post['text'] for post in item['posts'] for post in post['replies'] if post.get('city') == city and post['text'] is not None]
-            classified_messages = classifier(user_messages)
+            classified_messages = [sentiments[message] for message in user_messages]
             len_messages = len(classified_messages)
             positive = len([i for i in classified_messages if i['label']=='POSITIVE']) / len_messages
             negative = len([i for i in classified_messages if i['label']=='NEGATIVE']) / len_messages
@@ -332,7 +331,7 @@ class Vkontakte:
             }
 
         # Оставляем топ-20, сортируем city_stats по users_count 
-        sorted_city_stats = dict(sorted(city_stats.items(), key=lambda x: x[1]['users_count'], reverse=True)[:20])
+        sorted_city_stats = dict(top_k(city_stats.items(), 20, key=lambda x: x[1]['users_count']))
 
         top_regions = json.dumps(sorted_city_stats, indent=4, ensure_ascii=False)
         return top_regions
@@ -342,15 +341,13 @@ class Vkontakte:
         Лояльность пользователей (Net Promoter Score)
         ((Положительные комментарии - Негативные комментарии) / Всего комментариев) * 100%
         """
-        # https://huggingface.co/blanchefort/rubert-base-cased-sentiment модель для анализа тональности
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-
         for i in self.data:
             for item in i['vk']:
                 total_messages = [post['text'] for post in item['posts'] for post in post['replies'] if post['text'] is not None]
                 len_total_messages = len(total_messages)
                 
-                classified_messages = classifier(total_messages)
+                sentiments = annotate(total_messages)
+                classified_messages = [sentiments[message] for message in total_messages]
                 positive_count = sum(1 for i in classified_messages if i['label'] == 'POSITIVE')
                 negative_count = sum(1 for i in classified_messages if i['label'] == 'NEGATIVE')
 
@@ -368,9 +365,6 @@ class Vkontakte:
         lists = []
         results = []
         
-        # https://huggingface.co/blanchefort/rubert-base-cased-sentiment модель для анализа тональности
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-        
         # диапазоны длин символов
         dict_lengths = {1: '0-10', 2: '11-50', 3: '51-100', 4: '101-200', 5: '201+'}
 
@@ -398,19 +392,20 @@ class Vkontakte:
                         else:
                             comments_lengths[dict_lengths[5]].append(reply['text'])
 
+        sentiments = annotate(text for texts in comments_lengths.values() for text in texts)
+
         for lengths in comments_lengths.keys():
-            lists.append([classifier(_) for _ in comments_lengths[lengths]])
+            lists.append([sentiments[_] for _ in comments_lengths[lengths]])
             
         length_keys = dict_lengths.values()
 
         for list in lists:
-            total_score = sum(dict['score'] for sublist in list for dict in sublist)
+            total_score = sum(dict['score'] for dict in list)
 
             distribution = {'positive': 0, 'negative': 0, 'neutral': 0} 
             if total_score != 0:
-                for sublist in list:
-                    for dict in sublist:
-                        distribution[dict['label'].lower()] += (dict['score'] / total_score) * 100
+                for dict in list:
+                    distribution[dict['label'].lower()] += (dict['score'] / total_score) * 100
 
             results.append(distribution)
 
@@ -449,63 +444,24 @@ class PageRank:
     Топ-10 авторов с наибольшей способностью вовлекать других пользователей в дискуссию
     [пользователь | значение page rank]
     '''
-    def __init__(self, data, top_authors=10):
+    def __init__(self, data, top_authors=10, graph=None, render=False, weighted=False):
         self.data = data
         self.top_authors = top_authors
-        self.sender_id, self.sender_info, self.connections = self.__get_data()
-        self.__get_file()
+        # weighted - pagerank с весами ребер (число комментариев пользователя автору)
+        self.weighted = weighted
+        self.graph = graph if graph is not None else get_graph(data)
+        self.sender_id, self.sender_info, self.connections = self.graph.sender_id, self.graph.sender_info, self.graph.connections
+        # картинка графа (и раскладка узлов для нее) строится только по запросу, в фоне - ранжирование ее не ждет
+        self.image = self.__get_file() if render else None
         
-    def __get_data(self):
-        '''
-        sender_id - узлы (id пользователей)
-        sender_info - (словарь с id в качестве ключа и значений в качестве словаря из first_name и last_name)
-        connections - ребра (id-to-id)
-        '''
-        connections = []
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] != None:
-                post_connections = [(post['from']['id'], reply['sender_id']) for reply in post['replies']]
-                connections.extend(post_connections)
-
-        sender_id = list(set(sum(connections, ())))
-
-        sender_info = {}
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] is not None and post['from']['id'] in sender_id:
-                if post['from']['id'] not in sender_info:
-                    sender_info[post['from']['id']] = {
-                        'first_name': post['from']['first_name'],
-                        'last_name': post['from']['last_name']
-                    }
-
-        for post in self.data['vk'][0]['posts']:
-            if 'replies' in post:
-                for reply in post['replies']:
-                    if reply['sender_id'] in sender_id:
-                        if reply['sender_id'] not in sender_info:
-                            sender_info[reply['sender_id']] = {
-                                'first_name': reply['sender_name'],
-                                'last_name': reply['last_name']
-                            }
-
-        return sender_id, sender_info, connections
-
     def page_rank(self):
         '''
         Для получения топа пользователей pagerank {722219350: 0.04746, 732871646: 0.03822 ...}
         '''
-        G = nx.DiGraph()
-        [G.add_node(k, first_name = self.sender_info[k]['first_name'], last_name = self.sender_info[k]['last_name']) for k in self.sender_id]
-        G.add_edges_from(self.connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20) 
         
         # pagerank - https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.link_analysis.pagerank_alg.pagerank.html
-        pr = nx.pagerank(G)
-        sorted_pr = sorted(pr.items(), key=lambda x: x[1], reverse=True)
-
-        top_pr = sorted_pr[:self.top_authors] 
+        pr = self.graph.pagerank(weighted=self.weighted)
+        top_pr = top_items(pr, self.top_authors)
         
         # топ 10 пользователей с наибольшим pagerank
         name_surname_dict = {k: round(v, 5) for k, v in top_pr}
@@ -514,72 +470,31 @@ class PageRank:
     
     def __get_file(self):
         '''
-        Для сохранения файла pagerank
-        '''
-        # spring_layout - https://networkx.org/documentation/stable/reference/generated/networkx.drawing.layout.spring_layout.html
-        G = nx.DiGraph()
-        [G.add_node(k, first_name=self.sender_info[k]['first_name'], last_name=self.sender_info[k]['last_name']) for k in self.sender_id]
-        G.add_edges_from(self.connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20)
-
-        pr = nx.pagerank(G)
-        sorted_pr = sorted(pr.items(), key=lambda x: x[1], reverse=True)
-        top_pr = sorted_pr[:self.top_authors]
-        top_ids = [id for id, pr in top_pr]
-        top_nodes = {node: G.nodes[node]['first_name'] + ' ' + G.nodes[node]['last_name'] for node in dict(top_pr).keys()}
-
-        node_colors = ['#FF5558' if node in top_ids else "#27BBBD" for node in G.nodes()]
-        plt.figure(figsize=(10, 10))
-        nx.draw_networkx_labels(G, pos,
-                                labels=top_nodes,
-                                font_color='#333335',
-                                font_size=10,
-                                bbox=dict(facecolor='white', edgecolor='white', boxstyle='square'))
-        nx.draw(G, pos,
-                nodelist=list(pr.keys()),
-                node_size=[v * 20000 for v in pr.values()],
-                with_labels=False,
-                node_color=node_colors,
-                edge_color='#27BBBD',
-                width=0.2)
-        
-        current_dir = os.getcwd()
-        file_path = os.path.join(current_dir, 'data/PageRank.png')
-        plt.savefig(file_path) 
-        plt.close()  
+        Картинка графа pagerank: рисуется в фоне и кешируется по графу (rendering.py), возвращает Future с путем к файлу
+        '''
+        ranking = 'pagerank weighted' if self.weighted else 'pagerank'
+        values = self.graph.pagerank(weighted=self.weighted)
+        return render_ranking(self.graph, ranking, values, self.top_authors, figsize=(10, 10))
         
     def get_table(self):
         '''
         Данные для таблицы топ-инфлюенсеров
         '''
         result_dict = {}
-        for k, v in self.page_rank().items():
+        page_rank = self.page_rank()
+        for k, v in page_rank.items():
             name = self.sender_info[k]['first_name'] + ' ' + self.sender_info[k]['last_name']
             result_dict[name] = {
-                'page_rank': self.page_rank()[k],
+                'page_rank': page_rank[k],
                 'id': k
             }
 
+        # степени узлов и комментарии пользователя берутся из индексов графа, без обхода всех ребер и постов
         for key, value in result_dict.items():
-            id_to_find = value['id']
-            count = 0
-            for tpl in self.connections:
-                if id_to_find in tpl:
-                    count += 1
-            value['engagement_users'] = count
-        
-        for key, value in result_dict.items():
-            value['comments'] = []  # создаем пустой список для комментариев
-            
-        id = [value['id'] for key, value in result_dict.items()]
-
-        for post in self.data['vk'][0]['posts']:
-            for replies in post['replies']:
-                for key, value in result_dict.items():
-                    if replies['sender_id'] == value['id']:
-                        value['comments'].append(replies['text'])
+            value['engagement_users'] = self.graph.degree(value['id'])
+            value['comments'] = [reply['text'] for reply in self.graph.index.replies_of(value['id'])]
                         
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        sentiments = annotate(comment for value in result_dict.values() for comment in value['comments'])
         
         for key, value in result_dict.items():
             pos_count = 0
@@ -587,8 +502,7 @@ class PageRank:
             comments = value['comments']
 
             for comment in comments:
-                sentiment = classifier(comment)
-                if sentiment[0]['label'] == 'POSITIVE':
+                if sentiments[comment]['label'] == 'POSITIVE':
                     pos_count += 1
                 else:
                     neg_count += 1
@@ -611,135 +525,63 @@ class BetweennessCentralityRank:
     Топ-10 авторов с наибольшей способностью вовлекать других пользователей в дискуссию
     [пользователь | значение page rank]
     '''
-    def __init__(self, data, top_authors=10):
+    def __init__(self, data, top_authors=10, graph=None, render=False, betweenness=None):
         self.data = data
         self.top_authors = top_authors
-        self.sender_id, self.sender_info, self.connections = self.__get_data()
-        self.__get_file()
+        # параметры расчета betweenness, например {'mode': 'approximate', 'pivots': 500} или {'mode': 'approximate', 'epsilon': 0.01}
+        self.betweenness = dict({'top_k': top_authors}, **(betweenness or {}))
+        self.graph = graph if graph is not None else get_graph(data)
+        self.sender_id, self.sender_info, self.connections = self.graph.sender_id, self.graph.sender_info, self.graph.connections
+        # картинка графа (и раскладка узлов для нее) строится только по запросу, в фоне - ранжирование ее не ждет
+        self.image = self.__get_file() if render else None
         
-    def __get_data(self):
-        '''
-        sender_id - узлы (id пользователей)
-        sender_info - (словарь с id в качестве ключа и значений в качестве словаря из first_name и last_name)
-        connections - ребра (id-to-id)
-        '''
-        connections = []
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] != None:
-                post_connections = [(post['from']['id'], reply['sender_id']) for reply in post['replies']]
-                connections.extend(post_connections)
-
-        sender_id = list(set(sum(connections, ())))
-
-        sender_info = {}
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] is not None and post['from']['id'] in sender_id:
-                if post['from']['id'] not in sender_info:
-                    sender_info[post['from']['id']] = {
-                        'first_name': post['from']['first_name'],
-                        'last_name': post['from']['last_name']
-                    }
-
-        for post in self.data['vk'][0]['posts']:
-            if 'replies' in post:
-                for reply in post['replies']:
-                    if reply['sender_id'] in sender_id:
-                        if reply['sender_id'] not in sender_info:
-                            sender_info[reply['sender_id']] = {
-                                'first_name': reply['sender_name'],
-                                'last_name': reply['last_name']
-                            }
-
-        return sender_id, sender_info, connections
-
     def betweenness_centrality(self):
         '''
         Для получения топа пользователей betweenness_centrality_rank {722219350: 0.04746, 732871646: 0.03822 ...}
         '''
-        G = nx.DiGraph()
-        [G.add_node(k, first_name = self.sender_info[k]['first_name'], last_name = self.sender_info[k]['last_name']) for k in self.sender_id]
-        G.add_edges_from(self.connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20) 
         
         # pagerank - https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.link_analysis.pagerank_alg.pagerank.html
-        centrality = nx.betweenness_centrality(G)
-        sorted_centrality = sorted(centrality.items(), key=lambda x: x[1], reverse=True)
-
-        top_centrality = sorted_centrality[:self.top_authors] 
+        centrality = self.graph.betweenness_centrality(**self.betweenness)
+        top_centrality = top_items(centrality, self.top_authors)
         
         # топ 10 пользователей с наибольшим pagerank
         name_surname_dict = {k: round(v, 5) for k, v in top_centrality}
         
         return name_surname_dict # возвращает id и значение pagerank {722219350: 0.04746, 732871646: 0.03822 ...}    
     
+    def info(self):
+        '''
+        Параметры расчета betweenness: режим, число опорных вершин и узлов {'mode': 'exact', 'pivots': 120, 'nodes': 120}
+        '''
+        return self.graph.betweenness(**self.betweenness)[1]
+
     def __get_file(self):
         '''
-        Для сохранения файла pagerank
-        '''
-        # spring_layout - https://networkx.org/documentation/stable/reference/generated/networkx.drawing.layout.spring_layout.html
-        G = nx.DiGraph()
-        [G.add_node(k, first_name=self.sender_info[k]['first_name'], last_name=self.sender_info[k]['last_name']) for k in self.sender_id]
-        G.add_edges_from(self.connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20)
-
-        centrality = nx.betweenness_centrality(G)
-        sorted_centrality = sorted(centrality.items(), key=lambda x: x[1], reverse=True)
-        top_centrality = sorted_centrality[:self.top_authors] 
-        top_ids = [id for id, pr in top_centrality]
-        top_nodes = {node: G.nodes[node]['first_name'] + ' ' + G.nodes[node]['last_name'] for node in dict(top_centrality).keys()}
-
-        node_colors = ['#FF5558' if node in top_ids else '#27BBBD' for node in G.nodes()]
-        plt.figure(figsize=(15, 15))
-        nx.draw_networkx_labels(G, pos,
-                                labels=top_nodes,
-                                font_color='#333335',
-                                font_size=10,
-                                bbox=dict(facecolor='white', edgecolor='white', boxstyle='square'))
-        nx.draw(G, pos,
-                nodelist=list(centrality.keys()),
-                node_size=[v * 20000 for v in centrality.values()],
-                with_labels=False,
-                node_color=node_colors,
-                edge_color='#27BBBD',
-                width=0.2)
-        
-        current_dir = os.getcwd()
-        file_path = os.path.join(current_dir, 'data/BetweennessCentralityRank.png')
-        plt.savefig(file_path) 
-        plt.close()      
+        Картинка графа betweenness centrality: рисуется в фоне и кешируется по графу (rendering.py), возвращает Future с путем к файлу
+        '''
+        ranking = 'betweenness ' + json.dumps(self.betweenness, sort_keys=True)
+        values = self.graph.betweenness_centrality(**self.betweenness)
+        return render_ranking(self.graph, ranking, values, self.top_authors, figsize=(15, 15))
     
     def get_table(self):
         '''
         Данные для таблицы топ-инфлюенсеров BetweennessCentralityRank
         '''
         result_dict = {}
-        for k, v in self.betweenness_centrality().items():
+        centrality = self.betweenness_centrality()
+        for k, v in centrality.items():
             name = self.sender_info[k]['first_name'] + ' ' + self.sender_info[k]['last_name']
             result_dict[name] = {
-                'betweenness_centrality': self.betweenness_centrality()[k],
+                'betweenness_centrality': centrality[k],
                 'id': k
             }
 
+        # степени узлов и комментарии пользователя берутся из индексов графа, без обхода всех ребер и постов
         for key, value in result_dict.items():
-            id_to_find = value['id']
-            count = 0
-            for tpl in self.connections:
-                if id_to_find in tpl:
-                    count += 1
-            value['engagement_users'] = count
-        
-        for key, value in result_dict.items():
-            value['comments'] = []  
-
-        for post in self.data['vk'][0]['posts']:
-            for replies in post['replies']:
-                for key, value in result_dict.items():
-                    if replies['sender_id'] == value['id']:
-                        value['comments'].append(replies['text'])
+            value['engagement_users'] = self.graph.degree(value['id'])
+            value['comments'] = [reply['text'] for reply in self.graph.index.replies_of(value['id'])]
                         
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        sentiments = annotate(comment for value in result_dict.values() for comment in value['comments'])
         
         for key, value in result_dict.items():
             comments = value['comments']
@@ -749,8 +591,7 @@ class BetweennessCentralityRank:
             neu_count = 0
 
             for comment in comments:
-                sentiment = classifier(comment)
-                label = sentiment[0]['label']
+                label = sentiments[comment]['label']
 
                 if label == 'POSITIVE':
                     pos_count += 1
@@ -809,8 +650,8 @@ class InfluencerTable:
         ФИО пользователей с наибольшим числом инициированных постов
         '''
         self.data = self.__get_data()
-        sorted_data = sorted(self.data.values(), key=lambda x: x['messages'], reverse=True)
-        authors_names = {v['first_name'] + ' ' + v['last_name']: v['messages'] for v in sorted_data[:self.person]}
+        top_users = top_k(self.data.values(), self.person, key=lambda x: x['messages'])
+        authors_names = {v['first_name'] + ' ' + v['last_name']: v['messages'] for v in top_users}
         return authors_names # словарь {'first_name last_name': messages}, где messages - количество постов, инициированных данным пользователем
     
     def engagement_rate_by_reach(self):
@@ -818,11 +659,11 @@ class InfluencerTable:
         Коэффициент вовлеченности (Engagement Rate By Reach)
         (Общее число взаимодействий / Общее количество подписчиков сообщества) * 100%
         '''
-        sorted_data = sorted(self.data.values(), key=lambda x: x['messages'], reverse=True)
+        top_users = top_k(self.data.values(), self.person, key=lambda x: x['messages'])
 
         engagement_rates = {
             v['first_name'] + ' ' + v['last_name']: round(((v['likes'] + v['reposts'] + len(v['comments'])) / v['followers']) * 1000, 3) 
-            for v in sorted_data[:self.person] if v['followers'] != 0
+            for v in top_users if v['followers'] != 0
         }
         return engagement_rates # словарь {'first_name last_name': engagement_rate_by_reach}, engagement_rate_by_reach - вовлеченность
     
@@ -831,9 +672,8 @@ class InfluencerTable:
         Лояльность пользователей (Net Promoter Score)
         ((Положительные комментарии - Негативные комментарии) / Всего комментариев) * 100%
         """
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-        
-        top_users = sorted(self.data.values(), key=lambda x: x['messages'], reverse=True)[:self.person]
+        top_users = top_k(self.data.values(), self.person, key=lambda x: x['messages'])
+        sentiments = annotate(comment for user in top_users for comment in user['comments'])
         loyalty_scores = []
         
         for user in top_users:
@@ -841,10 +681,10 @@ class InfluencerTable:
             negative_count = 0
             
             for comment in user['comments']:
-                classified_comment = classifier(comment)
-                if classified_comment[0]['label'] == 'POSITIVE':
+                classified_comment = sentiments[comment]
+                if classified_comment['label'] == 'POSITIVE':
                     positive_count += 1
-                elif classified_comment[0]['label'] == 'NEGATIVE':
+                elif classified_comment['label'] == 'NEGATIVE':
                     negative_count += 1
             
             total_comments = len(user['comments'])
@@ -910,7 +750,7 @@ class InfluencerTableNegative:
     def __analyze_comments(self):
         self.data = self.__get_data()
         
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        sentiments = annotate(comment for info in self.data.values() for comment in info['comments'])
         
         for id, info in self.data.items():
             pos_count = 0
@@ -919,8 +759,7 @@ class InfluencerTableNegative:
             total_count = 0
             
             for comment in info['comments']:
-                result = classifier(comment)
-                sentiment = result[0]['label']
+                sentiment = sentiments[comment]['label']
                 
                 if sentiment == 'NEGATIVE':
                     neg_count += 1
@@ -939,8 +778,7 @@ class InfluencerTableNegative:
             info['negative_percentage'] = neg_perc
             info['neutral_percentage'] = neu_perc
 
-        sorted_data = sorted(self.data.items(), key=lambda x: x[1]['negative_percentage'], reverse=True)
-        self.neg_posts = sorted_data[:self.top_neg_posts]
+        self.neg_posts = top_k(self.data.items(), self.top_neg_posts, key=lambda x: x[1]['negative_percentage'])
     
     def __engagement_rate_by_reach(self):
         '''
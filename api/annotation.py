@@ -0,0 +1,97 @@
+import emoji
+import threading
+from datetime import datetime
+from sentiment import annotate
+
+# кейс из кеша (crawl_cache) может одновременно размечаться несколькими запросами - разметка одного кейса
+# выполняется по очереди, разные кейсы размечаются параллельно: {id кейса: [блокировка, число ожидающих]}
+_locks = {}
+_lock = threading.Lock()
+
+# сети, по которым API считает метрики (у постов tg нет поля date - только post_date, даты комментариев - строки)
+NETWORKS = ('vk',)
+
+# верхние границы диапазонов длин символов (как в character_length)
+LENGTH_BUCKETS = ((10, '0-10'), (51, '11-50'), (101, '51-100'), (201, '101-200'))
+
+
+def length_bucket(text):
+    '''
+    Диапазон длины комментария
+    '''
+    length = len(text)
+    for limit, name in LENGTH_BUCKETS:
+        if length <= limit:
+            return name
+    return '201+'
+
+
+def extract_emojis(text):
+    return ''.join(c for c in text if emoji.is_emoji(c))
+
+
+def day_bucket(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%d/%m/%Y")
+
+
+def annotate_groups(groups, sentiment=True):
+    '''
+    Однократная разметка постов и комментариев сообществ перед подсчетом метрик
+    post/reply['day'] - день публикации, reply['length_bucket'] - диапазон длины, reply['emojis'] - эмодзи,
+    post/reply['annotated_sentiment'] - тональность {'label': ..., 'score': ...} (только при sentiment=True;
+    поле sentiment от краулера - в другом формате, списком - не изменяется)
+    Повторный вызов для уже размеченных сообществ ничего не делает
+    '''
+    pending = [group for group in groups if 'structure' not in group.get('annotations', [])]
+    for group in pending:
+        for post in group['posts']:
+            post['day'] = day_bucket(post['date'])
+            for reply in post.get('replies', []):
+                reply['day'] = day_bucket(reply['date'])
+                if reply['text'] is not None:
+                    reply['length_bucket'] = length_bucket(reply['text'])
+                    reply['emojis'] = extract_emojis(reply['text'])
+                else:
+                    reply['length_bucket'] = None
+                    reply['emojis'] = ''
+        group.setdefault('annotations', []).append('structure')
+
+    if not sentiment:
+        return groups
+
+    pending = [group for group in groups if 'sentiment' not in group['annotations']]
+    if not pending:
+        return groups
+
+    # все тексты кейса размечаются одним вызовом модели
+    sentiments = annotate(text for group in pending for post in group['posts']
+                          for text in [post['text']] + [reply['text'] for reply in post.get('replies', [])])
+
+    for group in pending:
+        for post in group['posts']:
+            post['annotated_sentiment'] = sentiments.get(post['text'])
+            for reply in post.get('replies', []):
+                reply['annotated_sentiment'] = sentiments.get(reply['text'])
+        group['annotations'].append('sentiment')
+
+    return groups
+
+
+def annotate_crawl(crawling_case, sentiment=True, networks=NETWORKS):
+    '''
+    Разметка всех сообществ кейса краулинга в сетях networks
+    '''
+    key = id(crawling_case)
+    with _lock:
+        entry = _locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            annotate_groups([group for network in networks for group in crawling_case.get(network, [])], sentiment)
+    finally:
+        # кейс жив, пока идет разметка, поэтому id не достанется другому кейсу, пока запись в _locks
+        with _lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[key]
+    return crawling_case
@@ -1,15 +1,51 @@
 import json
+import os
+import threading
 from flask import Flask, request
 from flask_cors import cross_origin, CORS
 from functions import audience_coverage, channel_citation_index, net_promoter_score, love_rate, discussion_rate, character_length, top_emoji
 from model_functions import calculate_brand
-from influencers_functions import most_messages_users, high_negative_reactions, top_pagerank_influencers, top_bcr_rank_influencers
-from api_redis import redis_get
+from influencers_functions import most_messages_users, high_negative_reactions, top_pagerank_influencers, top_bcr_rank_influencers, BetweennessCentralityRank
+from api_redis import redis_get_cached
+from annotation import annotate_crawl
+from centrality import WORKERS, start_pool
+from sentiment import warmup
 
 
 app = Flask(__name__)
 CORS(app, resources={r"/*":{"origins":"*"}})
 
+# модель загружается и прогревается до того, как балансировщик начнет слать запросы (см. /ready)
+# SENTIMENT_WARMUP=0 - для воркеров, которые обслуживают только /post_involvement_analysis
+ready = threading.Event()
+# ошибка прогрева (например, не скачалась модель) - /ready отвечает 503 с текстом ошибки
+warmup_error = None
+
+def warmup_model():
+    global warmup_error
+    try:
+        if os.environ.get('SENTIMENT_WARMUP', '1') == '1':
+            warmup()
+    except Exception as e:
+        app.logger.exception('Прогрев модели тональности не удался')
+        warmup_error = repr(e)
+        return
+    ready.set()
+
+# процессы для betweenness запускаются до потоков прогрева и Flask (fork процесса с потоками может зависнуть)
+if WORKERS > 1:
+    start_pool()
+
+threading.Thread(target=warmup_model, daemon=True).start()
+
+@app.route("/ready", methods=['GET'])
+def readiness():
+    if ready.is_set():
+        return {"ready": True}
+    if warmup_error is not None:
+        return {"ready": False, "error": warmup_error}, 503
+    return {"ready": False}, 503
+
 @app.route("/post_involvement_analysis", methods=['POST','OPTIONS'])
 @cross_origin(origin='*',headers=['Content-Type', 'Access-Control-Allow-Origin'])
 def post_involvement_analysis():
@@ -18,7 +54,7 @@ def post_involvement_analysis():
     
     crawlingId = request_data['crawlingId']
     groupId = request_data['groupId']
-    crawling_case = redis_get(crawlingId)
+    crawling_case = annotate_crawl(redis_get_cached(crawlingId), sentiment=False)
 
     audience_coverage_metric = audience_coverage(crawling_case['vk']) 
     channel_cittaion_index_metric = channel_citation_index(crawling_case['vk'])
@@ -41,15 +77,21 @@ def influencers_analysis():
     
     crawlingId = request_data['crawlingId']
     groupId = request_data['groupId']
-    crawling_case = redis_get(crawlingId)
+    # {"mode": "approximate", "pivots": 500} или {"mode": "approximate", "epsilon": 0.01}, по умолчанию точный расчет
+    betweenness = request_data.get('betweenness')
+    # pagerank с весами ребер (число комментариев пользователя автору); для betweenness - {"weighted": true}
+    weighted = request_data.get('weighted', False)
+    crawling_case = annotate_crawl(redis_get_cached(crawlingId))
 
     most_messages = most_messages_users(crawling_case) 
-    page_rank = top_pagerank_influencers(crawling_case)
-    bcr_rank = top_bcr_rank_influencers(crawling_case)
+    page_rank = top_pagerank_influencers(crawling_case, weighted)
+    bcr_rank = top_bcr_rank_influencers(crawling_case, betweenness)
     high_negative = high_negative_reactions(crawling_case)
 
+    # параметры расчета берутся по тем же параметрам betweenness, что и bcr_rank (граф и расчет уже в кеше)
+    metadata = {"bcr_rank": BetweennessCentralityRank(crawling_case, betweenness=betweenness).info()}
 
-    return {"most_messages": most_messages, "page_rank": page_rank, "bcr_rank": bcr_rank, "high_negative": high_negative}
+    return {"most_messages": most_messages, "page_rank": page_rank, "bcr_rank": bcr_rank, "high_negative": high_negative, "metadata": metadata}
 
 @app.route("/brand_rating", methods=['POST','OPTIONS'])
 @cross_origin(origin='*',headers=['Content-Type', 'Access-Control-Allow-Origin'])
@@ -63,7 +105,7 @@ def brand_rating():
 
     print(weights)
 
-    crawling_case = redis_get(crawlingId)
+    crawling_case = annotate_crawl(redis_get_cached(crawlingId))
     brand_result = calculate_brand(crawling_case, tuple(weights)) 
 
     return {"rating": brand_result[0], "weakness": brand_result[1]}
@@ -1,10 +1,229 @@
-from redis import Redis
-import json
+import asyncio
+import os
+import threading
+import weakref
+from redis import BlockingConnectionPool, Redis
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError, WatchError
+from redis.retry import Retry
+from crawl_cache import get_crawl_cache
+from crawl_codec import COMPRESSION, FORMAT, decode, encode, read_columns, read_crawl
 
+REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+REDIS_DB = int(os.environ.get('REDIS_DB', 0))
+# не больше REDIS_MAX_CONNECTIONS соединений на процесс, запрос ждет свободное соединение до REDIS_POOL_TIMEOUT секунд
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 16))
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 10))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 5))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 2))
+# повторы команды при обрыве соединения и таймауте (с экспоненциальной паузой)
+REDIS_RETRIES = int(os.environ.get('REDIS_RETRIES', 3))
 
+# кейсы читаются кусками по REDIS_CHUNK_SIZE байт, один кусок - один запрос GETRANGE
+REDIS_CHUNK_SIZE = 1 << 20
 
-r = Redis(host='localhost', port=6379, decode_responses=True)
+# номер версии кейса <ключ>:version увеличивается при каждой записи через redis_set; краулер, записывающий кейсы напрямую,
+# тоже должен увеличивать его (INCR) - иначе кеш узнает о перезаписи только по длине значения или по истечении CRAWL_CACHE_TTL
+VERSION_SUFFIX = ':version'
 
 
-def redis_get(key):
-    return json.loads(r.get(key))
+def connection_options(retry, host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB):
+    '''
+    Параметры соединения, общие для синхронного и асинхронного клиента (retry - класс Retry нужного клиента)
+    '''
+    # без decode_responses: значение может быть бинарным (crawl_codec), а кусок JSON - разрезать символ utf-8
+    return {'host': host, 'port': port, 'db': db,
+            'socket_timeout': REDIS_SOCKET_TIMEOUT, 'socket_connect_timeout': REDIS_CONNECT_TIMEOUT,
+            'retry': retry(ExponentialBackoff(cap=1, base=0.05), REDIS_RETRIES),
+            'retry_on_error': [ConnectionError, TimeoutError],
+            'health_check_interval': 30}
+
+
+def make_client(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, max_connections=REDIS_MAX_CONNECTIONS):
+    '''
+    Клиент с ограниченным пулом соединений
+    '''
+    pool = BlockingConnectionPool(max_connections=max_connections, timeout=REDIS_POOL_TIMEOUT,
+                                  **connection_options(Retry, host, port, db))
+    return Redis(connection_pool=pool)
+
+
+def make_async_client(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, max_connections=REDIS_MAX_CONNECTIONS):
+    '''
+    Асинхронный клиент (redis.asyncio) с ограниченным пулом соединений; пул привязан к циклу событий, в котором используется
+    '''
+    from redis import asyncio as aioredis
+    from redis.asyncio.retry import Retry as AsyncRetry
+
+    pool = aioredis.BlockingConnectionPool(max_connections=max_connections, timeout=REDIS_POOL_TIMEOUT,
+                                           **connection_options(AsyncRetry, host, port, db))
+    return aioredis.Redis(connection_pool=pool)
+
+
+r = make_client()
+# асинхронные клиенты по циклам событий: пул redis.asyncio нельзя использовать из другого цикла
+_async_clients = weakref.WeakKeyDictionary()
+_async_lock = threading.Lock()
+
+
+def get_async_client():
+    '''
+    Асинхронный клиент текущего цикла событий (создается при первом обращении из цикла)
+    '''
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        if loop not in _async_clients:
+            _async_clients[loop] = make_async_client()
+        return _async_clients[loop]
+
+
+class RedisStream:
+    '''
+    Значение ключа Redis как бинарный файл: read(size) - следующие size байт (GETRANGE)
+    '''
+    def __init__(self, client, key):
+        self.client = client
+        self.key = key
+        self.offset = 0
+
+    def read(self, size=-1):
+        if size == 0:
+            return b''
+        # size < 0 - до конца значения
+        chunk = self.client.getrange(self.key, self.offset, self.offset + size - 1 if size > 0 else -1)
+        self.offset += len(chunk)
+        return chunk
+
+
+def redis_read(key, read, client=None, versioned=False):
+    '''
+    read(stream) по согласованному снимку значения: ключ отслеживается WATCH, пока значение читается кусками,
+    и если его перезаписали во время чтения, чтение повторяется (не больше REDIS_RETRIES раз)
+    Возвращает (version, size, результат read); version - метка прочитанного значения (см. redis_version),
+    если versioned, иначе None
+    '''
+    client = r if client is None else client
+    for attempt in range(REDIS_RETRIES + 1):
+        with client.pipeline() as pipe:
+            pipe.watch(key)
+            if versioned:
+                version, size = redis_version(key, pipe)
+            else:
+                version, size = None, pipe.strlen(key)
+                if not size:
+                    raise KeyError(key)
+            try:
+                result = read(RedisStream(pipe, key))
+            except Exception:
+                # ошибка разбора из-за смеси двух значений - повтор, иначе ошибка самого кейса
+                if _changed(pipe):
+                    continue
+                raise
+            if not _changed(pipe):
+                return version, size, result
+    raise WatchError('Кейс %s перезаписывался во время каждого чтения' % key)
+
+
+def _changed(pipe):
+    '''
+    Перезаписан ли отслеживаемый ключ с начала WATCH
+    '''
+    try:
+        pipe.multi()
+        pipe.ping()
+        pipe.execute()
+    except WatchError:
+        return True
+    return False
+
+
+def redis_get(key, client=None):
+    '''
+    Кейс краулинга любого формата (см. crawl_codec) - JSON разбирается по мере чтения, весь текст кейса в памяти не хранится
+    '''
+    return redis_read(key, lambda stream: read_crawl(stream, REDIS_CHUNK_SIZE), client)[2]
+
+
+def redis_columns(key, client=None):
+    '''
+    Кейс краулинга в колоночном представлении (см. load_columns) - посты в памяти не хранятся
+    '''
+    return redis_read(key, lambda stream: read_columns(stream, REDIS_CHUNK_SIZE), client)[2]
+
+
+def redis_version(key, client=None):
+    '''
+    Метка версии кейса и длина значения в байтах (version, size) - значение не читается и не хешируется
+    Метка - номер версии <ключ>:version ('v3') или, для ключей без него, длина значения ('n1048576'):
+    такая запись кеша действительна до изменения длины или до истечения срока хранения
+    '''
+    client = r if client is None else client
+    version, size = client.get(key + VERSION_SUFFIX), client.strlen(key)
+    if not size:
+        raise KeyError(key)
+    return ('n%d' % size if version is None else 'v' + version.decode('ascii')), size
+
+
+def redis_get_cached(key, client=None, cache=None):
+    '''
+    Кейс краулинга через кеш процесса (crawl_cache): разбирается заново, только если изменилась версия ключа,
+    истек срок хранения или кейс вытеснен
+    '''
+    cache = get_crawl_cache() if cache is None else cache
+    version, size = redis_version(key, client)
+
+    def load():
+        # в кеш кейс попадает с меткой того значения, которое фактически прочитано
+        version, size, crawl = redis_read(key, lambda stream: read_crawl(stream, REDIS_CHUNK_SIZE), client, versioned=True)
+        return version, crawl
+
+    return cache.get_or_load(key, version, load)
+
+
+def redis_get_many(keys, client=None):
+    '''
+    Несколько кейсов за один обмен с Redis (pipeline), в порядке keys; нет ключа - None
+    '''
+    client = r if client is None else client
+    with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.get(key)
+        payloads = pipe.execute()
+    return [None if payload is None else decode(payload) for payload in payloads]
+
+
+def redis_set(key, crawl, format=FORMAT, compression=COMPRESSION, client=None):
+    '''
+    Запись кейса в формате format со сжатием compression (по умолчанию - CRAWL_FORMAT, CRAWL_COMPRESSION)
+    вместе с увеличением номера версии (кеши кейса в процессах API становятся недействительными)
+    '''
+    client = r if client is None else client
+    with client.pipeline(transaction=True) as pipe:
+        pipe.set(key, encode(crawl, format, compression))
+        pipe.incr(key + VERSION_SUFFIX)
+        pipe.execute()
+
+
+async def redis_get_async(key, client=None):
+    '''
+    Кейс краулинга для асинхронного сервера: значение читается одной командой, разбирается в отдельном потоке,
+    чтобы не блокировать цикл событий
+    '''
+    client = get_async_client() if client is None else client
+    payload = await client.get(key)
+    if payload is None:
+        raise KeyError(key)
+    return await asyncio.to_thread(decode, payload)
+
+
+async def redis_get_many_async(keys, client=None):
+    '''
+    Асинхронный вариант redis_get_many
+    '''
+    client = get_async_client() if client is None else client
+    async with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.get(key)
+        payloads = await pipe.execute()
+    return await asyncio.to_thread(lambda: [None if payload is None else decode(payload) for payload in payloads])
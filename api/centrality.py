@@ -0,0 +1,215 @@
+import heapq
+import math
+import os
+import random
+import threading
+from collections import deque
+from topk import top_items
+
+# значения по умолчанию для приближенного режима
+EPSILON = 0.05
+DELTA = 0.1
+PATIENCE = 3
+
+# точный расчет по компонентам связности в пуле процессов (для графов не меньше PARALLEL_MIN_NODES узлов)
+# пул включается явно, например CENTRALITY_WORKERS=8, только в процессах API, считающих betweenness больших графов:
+# процессы пула запускаются при старте API и занимают память, по умолчанию (1) пула нет
+WORKERS = int(os.environ.get('CENTRALITY_WORKERS', 1))
+PARALLEL_MIN_NODES = int(os.environ.get('CENTRALITY_PARALLEL_MIN_NODES', 5000))
+
+# пулы процессов по числу процессов (создаются при первом обращении)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pivots_for_error(n, epsilon=EPSILON, delta=DELTA):
+    '''
+    Число опорных вершин, при котором ошибка оценки каждой вершины не больше epsilon с вероятностью 1 - delta
+    (неравенство Хёфдинга + объединение по всем n вершинам)
+    '''
+    return math.ceil(math.log(2 * n / delta) / (2 * epsilon ** 2))
+
+
+def _accumulate(G, source, betweenness):
+    '''
+    Один шаг алгоритма Брандеса: вклад кратчайших путей из source в betweenness
+    '''
+    stack = []
+    predecessors = {source: []}
+    sigma = {source: 1}
+    distance = {source: 0}
+    queue = deque([source])
+
+    while queue:
+        v = queue.popleft()
+        stack.append(v)
+        for w in G.succ[v]:
+            if w not in distance:
+                distance[w] = distance[v] + 1
+                sigma[w] = 0
+                predecessors[w] = []
+                queue.append(w)
+            if distance[w] == distance[v] + 1:
+                sigma[w] += sigma[v]
+                predecessors[w].append(v)
+
+    dependency = dict.fromkeys(stack, 0)
+    while stack:
+        w = stack.pop()
+        coefficient = (1 + dependency[w]) / sigma[w]
+        for v in predecessors[w]:
+            dependency[v] += sigma[v] * coefficient
+        if w != source:
+            betweenness[w] += dependency[w]
+
+
+def _top(betweenness, top_k):
+    return frozenset(node for node, value in top_items(betweenness, top_k) if value > 0)
+
+
+def approximate_betweenness(G, pivots=None, epsilon=None, top_k=10, seed=0, patience=PATIENCE):
+    '''
+    Приближенный betweenness centrality по случайной выборке опорных вершин (нормировка как в nx.betweenness_centrality)
+    pivots - максимальное число опорных вершин, либо epsilon - допустимая ошибка (из нее считается pivots)
+    Выборка останавливается раньше, если топ-k вершин не меняется patience раундов подряд
+    Возвращает (centrality, info), info - параметры и фактическое число опорных вершин
+    '''
+    nodes = list(G)
+    n = len(nodes)
+    if pivots is None:
+        pivots = pivots_for_error(max(n, 1), epsilon if epsilon is not None else EPSILON)
+    pivots = min(pivots, n)
+
+    random.Random(seed).shuffle(nodes)
+    betweenness = dict.fromkeys(G, 0.0)
+    step = max(32, pivots // 20)
+
+    sampled = 0
+    stable_rounds = 0
+    top = frozenset()
+
+    while sampled < pivots:
+        for source in nodes[sampled:min(sampled + step, pivots)]:
+            _accumulate(G, source, betweenness)
+        sampled = min(sampled + step, pivots)
+
+        current = _top(betweenness, top_k)
+        stable_rounds = stable_rounds + 1 if current and current == top else 0
+        top = current
+        if stable_rounds >= patience:
+            break
+
+    scale = 1 / ((n - 1) * (n - 2)) if n > 2 else 1
+    if sampled:
+        scale *= n / sampled
+    centrality = {node: value * scale for node, value in betweenness.items()}
+
+    info = {
+        'mode': 'approximate',
+        'pivots': sampled,
+        'max_pivots': pivots,
+        'nodes': n,
+        'epsilon': epsilon,
+        'top_k_stable': stable_rounds >= patience,
+    }
+    return centrality, info
+
+
+def betweenness_tasks(G, batches):
+    '''
+    Разбиение точного расчета на batches задач примерно равной стоимости (узлы * ребра компоненты)
+    Слабые компоненты связности независимы; мелкие компоненты объединяются в одну задачу,
+    крупная компонента делится на несколько задач по опорным вершинам (вклады опорных вершин складываются)
+    Компоненты меньше 3 узлов пропускаются - через их узлы не проходит ни один кратчайший путь
+    Возвращает список задач (ребра, опорные вершины или None - все вершины задачи)
+    '''
+    import networkx as nx
+
+    components = []
+    for nodes in nx.weakly_connected_components(G):
+        if len(nodes) > 2:
+            components.append((len(nodes) * G.subgraph(nodes).number_of_edges(), nodes))
+    components.sort(key=lambda x: x[0], reverse=True)
+    if not components:
+        return []
+    target = sum(cost for cost, nodes in components) / batches
+
+    tasks = []
+    # жадно: следующая (меньшая) компонента - в самую легкую из задач с мелкими компонентами
+    small = []
+    for cost, nodes in components:
+        edges = list(G.subgraph(nodes).edges())
+        if cost > target:
+            sources = list(nodes)
+            chunks = math.ceil(cost / target)
+            tasks.extend((edges, sources[i::chunks]) for i in range(chunks))
+        else:
+            if len(small) < batches:
+                small.append([0, len(small), []])
+                heapq.heapify(small)
+            lightest = heapq.heappop(small)
+            lightest[0] += cost
+            lightest[2].extend(edges)
+            heapq.heappush(small, lightest)
+
+    tasks.extend((edges, None) for cost, i, edges in small)
+    return tasks
+
+
+def _task_betweenness(task):
+    '''
+    Ненормированный betweenness по опорным вершинам задачи (выполняется в процессе пула)
+    '''
+    import networkx as nx
+
+    edges, sources = task
+    H = nx.DiGraph(edges)
+    betweenness = dict.fromkeys(H, 0.0)
+    for source in (H if sources is None else sources):
+        _accumulate(H, source, betweenness)
+    return betweenness
+
+
+def get_pool(workers=WORKERS):
+    '''
+    Общий пул из workers процессов (свой для каждого числа процессов)
+    Контекст fork: spawn и forkserver заново импортируют запущенный скрипт (api.py с прогревом модели) в каждом процессе
+    fork процесса с потоками (torch, прогрев модели, Flask) может зависнуть - сервер запускает пул через start_pool
+    до того, как создаст свои потоки
+    '''
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        return _pools[workers]
+
+
+def start_pool(workers=WORKERS):
+    '''
+    Запуск процессов пула заранее: с контекстом fork все процессы пула создаются при первой задаче
+    '''
+    get_pool(workers).submit(int).result()
+
+
+def parallel_betweenness(G, workers=WORKERS):
+    '''
+    Точный betweenness centrality в пуле процессов (задачи - centrality.betweenness_tasks)
+    Кратчайшие пути не выходят за компоненту, поэтому ненормированные значения считаются независимо и складываются,
+    а нормировка 1 / ((n - 1)(n - 2)) применяется по всему графу - результат совпадает с nx.betweenness_centrality
+    Возвращает (centrality, info)
+    '''
+    n = len(G)
+    # задач больше, чем процессов, чтобы крупная задача не задерживала остальные
+    tasks = betweenness_tasks(G, 4 * workers)
+
+    betweenness = dict.fromkeys(G, 0.0)
+    for result in get_pool(workers).map(_task_betweenness, tasks):
+        for node, value in result.items():
+            betweenness[node] += value
+
+    scale = 1 / ((n - 1) * (n - 2)) if n > 2 else 1
+    centrality = {node: value * scale for node, value in betweenness.items()}
+    info = {'mode': 'exact', 'pivots': n, 'nodes': n, 'workers': workers, 'tasks': len(tasks)}
+    return centrality, info
@@ -0,0 +1,154 @@
+import os
+from object_cache import ObjectCache
+
+# колонки сообществ - обычных словарей, не прочитанных crawl_stream/crawl_codec (в кейсе может быть много сообществ)
+COLUMNS_CACHE_SIZE = int(os.environ.get('COLUMNS_CACHE_SIZE', 256))
+
+
+class CrawlColumns:
+    '''
+    Колоночное представление группы кейса (элемента data['vk'] / data['tg']): поля постов и комментариев в массивах NumPy
+    Строится один раз, метрики считаются векторными операциями вместо обхода вложенных словарей
+    Посты: views (None -> 0, маска has_views), forwards, date, has_author, author_is_member
+    Реакции постов: reaction_post (номер поста), reaction_emoji, reaction_count
+    Комментарии: reply_sender, reply_date, reply_reactions (сумма реакций), текст - reply_text(j)
+    Комментарии поста i: reply_offsets[i]:reply_offsets[i + 1]
+    Посты читаются из group['posts'] один раз по порядку - это может быть и генератор (см. crawl_stream.load_columns)
+    '''
+    def __init__(self, group):
+        import numpy as np
+
+        views, has_views, forwards, dates, has_author, is_member = [], [], [], [], [], []
+        reaction_post, reaction_emoji, reaction_count = [], [], []
+        reply_offsets = [0]
+        reply_sender, reply_date, reply_reactions, texts = [], [], [], []
+
+        for i, post in enumerate(group['posts']):
+            views.append(post['views'] or 0)
+            has_views.append(post['views'] is not None)
+            forwards.append(post.get('forwards') or 0)
+            dates.append(post.get('date'))
+            has_author.append(post.get('from') is not None)
+            is_member.append(post['from'].get('is_member') or 0 if post.get('from') is not None else 0)
+
+            for reaction in post['reactions']:
+                reaction_post.append(i)
+                reaction_emoji.append(reaction['emoji'])
+                reaction_count.append(reaction['count'])
+
+            replies = post.get('replies', [])
+            for reply in replies:
+                reply_sender.append(reply['sender_id'])
+                reply_date.append(reply.get('date'))
+                reply_reactions.append(sum(reaction['count'] for reaction in reply.get('reactions', [])))
+                texts.append(reply['text'])
+            reply_offsets.append(reply_offsets[-1] + len(replies))
+
+        self.views = np.array(views, dtype=np.int64)
+        self.has_views = np.array(has_views, dtype=bool)
+        self.forwards = np.array(forwards, dtype=np.int64)
+        # даты как в кейсе (ВКонтакте - timestamp, Telegram - строка)
+        self.date = np.array(dates, dtype=object)
+        self.has_author = np.array(has_author, dtype=bool)
+        self.author_is_member = np.array(is_member, dtype=np.int64)
+
+        self.reaction_post = np.array(reaction_post, dtype=np.int64)
+        self.reaction_emoji = np.array(reaction_emoji, dtype=object)
+        self.reaction_count = np.array(reaction_count, dtype=np.int64)
+
+        self.reply_offsets = np.array(reply_offsets, dtype=np.int64)
+        self.reply_sender = np.array(reply_sender)
+        self.reply_date = np.array(reply_date, dtype=object)
+        self.reply_reactions = np.array(reply_reactions, dtype=np.int64)
+
+        # тексты комментариев - одна строка и смещения (None хранится как пустая строка с маской has_text)
+        self.has_text = np.array([text is not None for text in texts], dtype=bool)
+        texts = [text or '' for text in texts]
+        self.text = ''.join(texts)
+        self.text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=self.text_offsets[1:])
+
+    def __len__(self):
+        return len(self.views)
+
+    def reply_count(self):
+        '''
+        Число комментариев каждого поста
+        '''
+        import numpy as np
+        return np.diff(self.reply_offsets)
+
+    def reply_post(self):
+        '''
+        Номер поста каждого комментария
+        '''
+        import numpy as np
+        return np.repeat(np.arange(len(self)), self.reply_count())
+
+    def reply_text(self, j):
+        if not self.has_text[j]:
+            return None
+        return self.text[self.text_offsets[j]:self.text_offsets[j + 1]]
+
+    def reactions(self, emoji=None):
+        '''
+        Сумма реакций каждого поста (emoji - только реакции этого типа)
+        '''
+        import numpy as np
+
+        mask = slice(None) if emoji is None else self.reaction_emoji == emoji
+        return np.bincount(self.reaction_post[mask], weights=self.reaction_count[mask], minlength=len(self)).astype(np.int64)
+
+    def first_reaction(self):
+        '''
+        Число первой реакции каждого поста (post['reactions'][0]['count'], 0 - если реакций нет)
+        '''
+        import numpy as np
+
+        first = np.zeros(len(self), dtype=np.int64)
+        # реакции поста идут подряд, return_index - номер первой из них
+        posts, index = np.unique(self.reaction_post, return_index=True)
+        first[posts] = self.reaction_count[index]
+        return first
+
+    def unique_senders(self):
+        '''
+        Число уникальных авторов комментариев
+        '''
+        import numpy as np
+
+        if self.reply_sender.dtype.kind in 'iu':
+            return len(np.unique(self.reply_sender))
+        return len(set(self.reply_sender.tolist()))
+
+    def unique_senders_per_post(self):
+        '''
+        Число уникальных авторов комментариев каждого поста
+        '''
+        import numpy as np
+
+        if not len(self.reply_sender):
+            return np.zeros(len(self), dtype=np.int64)
+        _, senders = np.unique(self.reply_sender.astype(str) if self.reply_sender.dtype.kind not in 'iu' else self.reply_sender,
+                               return_inverse=True)
+        pairs = np.unique(self.reply_post() * (senders.max() + 1) + senders)
+        return np.bincount(pairs // (senders.max() + 1), minlength=len(self))
+
+
+class ColumnsGroup(dict):
+    '''
+    Сообщество кейса, прочитанное crawl_stream/crawl_codec: колоночное представление хранится в атрибуте columns
+    (строится при первом get_columns или сразу при чтении - см. crawl_stream.load_columns) и живет, пока живо сообщество
+    Остается обычным словарем для JSON: колонки в него не записываются
+    '''
+    columns = None
+
+
+_columns = ObjectCache(COLUMNS_CACHE_SIZE, 'columns')
+
+
+def get_columns(group):
+    '''
+    Колоночное представление группы (создается при первом обращении и запоминается для этого объекта группы)
+    '''
+    return _columns.get(group, CrawlColumns)
@@ -0,0 +1,144 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# не больше CRAWL_CACHE_SIZE кейсов, занимающих в памяти (по оценке estimate_size) не больше CRAWL_CACHE_BYTES,
+# каждый - не дольше CRAWL_CACHE_TTL секунд
+CRAWL_CACHE_SIZE = int(os.environ.get('CRAWL_CACHE_SIZE', 8))
+CRAWL_CACHE_BYTES = int(os.environ.get('CRAWL_CACHE_BYTES', 1024 * 2 ** 20))
+CRAWL_CACHE_TTL = float(os.environ.get('CRAWL_CACHE_TTL', 300))
+
+# прирост памяти поста или комментария после разметки (annotation.annotate_groups: день, длина, эмодзи, тональность)
+ANNOTATION_BYTES = 600
+
+
+def estimate_size(crawl):
+    '''
+    Оценка памяти разобранного кейса в байтах: sys.getsizeof словарей, списков и значений с запасом на разметку
+    каждого поста и комментария (ключи словарей не считаются - разборщик JSON хранит одинаковые ключи один раз)
+    '''
+    size = 0
+    stack = [crawl]
+    while stack:
+        value = stack.pop()
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            if 'text' in value:
+                size += ANNOTATION_BYTES
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return size
+
+
+class CrawlCache:
+    '''
+    Кеш разобранных кейсов в памяти процесса: вытесняются давно не использованные кейсы (LRU),
+    запись живет не дольше ttl и действительна, пока не изменилась версия ключа (любая метка, меняющаяся при перезаписи)
+    size - память кейса для ограничения max_bytes (по умолчанию - оценка estimate_size)
+    '''
+    def __init__(self, max_size=CRAWL_CACHE_SIZE, max_bytes=CRAWL_CACHE_BYTES, ttl=CRAWL_CACHE_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+        self.__loading = {}
+
+    def get(self, key, version):
+        with self.__lock:
+            crawl = self.__lookup(key, version)
+            if crawl is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return crawl
+
+    def put(self, key, version, crawl, size=None):
+        size = estimate_size(crawl) if size is None else size
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            # кейс больше всего кеша не сохраняется (иначе он вытеснил бы все остальные), кейс без версии - тоже
+            if size > self.max_bytes or self.max_size <= 0 or version is None:
+                return
+            self.__entries[key] = {'version': version, 'crawl': crawl, 'size': size, 'expires': self.__clock() + self.ttl}
+            self.__bytes += size
+            while len(self.__entries) > self.max_size or self.__bytes > self.max_bytes:
+                self.__remove(next(iter(self.__entries)))
+
+    def get_or_load(self, key, version, load):
+        '''
+        Кейс из кеша или load() с сохранением в кеш; одновременные запросы одного ключа и версии загружают кейс один раз
+        load() возвращает (version, crawl) - кейс сохраняется с версией, которую load фактически прочитал
+        '''
+        crawl = self.get(key, version)
+        if crawl is not None:
+            return crawl
+
+        with self.__lock:
+            lock = self.__loading.setdefault((key, version), threading.Lock())
+        try:
+            with lock:
+                with self.__lock:
+                    crawl = self.__lookup(key, version)
+                if crawl is None:
+                    loaded, crawl = load()
+                    self.put(key, loaded, crawl)
+                return crawl
+        finally:
+            with self.__lock:
+                self.__loading.pop((key, version), None)
+
+    def invalidate(self, key):
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+
+    def stats(self):
+        '''
+        Счетчики попаданий и промахов, число и суммарный размер кейсов
+        '''
+        with self.__lock:
+            return {'size': len(self.__entries), 'bytes': self.__bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def __lookup(self, key, version):
+        '''
+        Кейс из кеша (устаревшая или истекшая запись удаляется)
+        '''
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        if entry['version'] != version or entry['expires'] <= self.__clock():
+            self.__remove(key)
+            return None
+        self.__entries.move_to_end(key)
+        return entry['crawl']
+
+    def __remove(self, key):
+        self.__bytes -= self.__entries.pop(key)['size']
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_crawl_cache():
+    '''
+    Общий на весь процесс кеш кейсов (CRAWL_CACHE_SIZE=0 отключает кеш)
+    '''
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = CrawlCache()
+    return _cache
@@ -0,0 +1,204 @@
+import json
+import os
+import zlib
+from columns import CrawlColumns
+from crawl_stream import CHUNK_SIZE, as_crawl, load_columns, load_crawl
+
+# формат записи кейса: json (orjson, если установлен) или msgpack; сжатие: none, zlib, zstd, lz4
+FORMAT = os.environ.get('CRAWL_FORMAT', 'json')
+COMPRESSION = os.environ.get('CRAWL_COMPRESSION', 'none')
+
+# заголовок: MAGIC + байт формата + байт сжатия; значение без заголовка - JSON в старом формате
+MAGIC = b'SNA\x01'
+FORMATS = {'json': b'j', 'msgpack': b'm'}
+COMPRESSIONS = {'none': b'-', 'zlib': b'z', 'zstd': b's', 'lz4': b'l'}
+HEADER_SIZE = len(MAGIC) + 2
+
+
+def header(payload):
+    '''
+    Формат и сжатие по началу значения (format, compression); старый JSON без заголовка - ('json', 'none')
+    '''
+    if not payload.startswith(MAGIC):
+        return 'json', 'none'
+    formats = {code: name for name, code in FORMATS.items()}
+    compressions = {code: name for name, code in COMPRESSIONS.items()}
+    format, compression = payload[len(MAGIC):len(MAGIC) + 1], payload[len(MAGIC) + 1:HEADER_SIZE]
+    if format not in formats or compression not in compressions:
+        raise ValueError('Неизвестный формат кейса %r' % payload[:HEADER_SIZE])
+    return formats[format], compressions[compression]
+
+
+def encode(crawl, format=FORMAT, compression=COMPRESSION):
+    '''
+    Кейс в байты с заголовком; json без сжатия пишется без заголовка (читается и старым кодом)
+    '''
+    if format not in FORMATS or compression not in COMPRESSIONS:
+        raise ValueError('Неизвестный формат кейса %s/%s' % (format, compression))
+
+    if format == 'msgpack':
+        import msgpack
+        data = msgpack.packb(crawl, use_bin_type=True)
+    else:
+        data = _dumps(crawl)
+
+    if format == 'json' and compression == 'none':
+        return data
+    return MAGIC + FORMATS[format] + COMPRESSIONS[compression] + _compress(data, compression)
+
+
+def decode(payload):
+    '''
+    Кейс из байтов любого формата (формат определяется по заголовку)
+    '''
+    format, compression = header(payload)
+    if payload.startswith(MAGIC):
+        payload = _decompress(payload[HEADER_SIZE:], compression)
+    return as_crawl(_unpack(payload, format))
+
+
+def read_crawl(fp, chunk_size=CHUNK_SIZE):
+    '''
+    Кейс из бинарного файла любого формата: JSON разбирается потоково (crawl_stream.load_crawl)
+    с распаковкой на лету, msgpack - целиком
+    '''
+    format, stream = _open(fp)
+    if format == 'json':
+        return load_crawl(stream, chunk_size)
+    return as_crawl(_unpack(_read_all(stream, chunk_size), format))
+
+
+def read_columns(fp, chunk_size=CHUNK_SIZE):
+    '''
+    Кейс из бинарного файла любого формата в колоночном представлении (см. crawl_stream.load_columns)
+    '''
+    format, stream = _open(fp)
+    if format == 'json':
+        return load_columns(stream, chunk_size)
+
+    crawl = as_crawl(_unpack(_read_all(stream, chunk_size), format))
+    for item in crawl if isinstance(crawl, list) else [crawl]:
+        for network in ('vk', 'tg'):
+            for group in item.get(network, []):
+                if 'posts' in group:
+                    group.columns = CrawlColumns(group)
+                    del group['posts']
+    return crawl
+
+
+def _unpack(data, format):
+    if format == 'msgpack':
+        import msgpack
+        return msgpack.unpackb(data, raw=False)
+    return _loads(data)
+
+
+def _dumps(crawl):
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(crawl, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return orjson.dumps(crawl)
+
+
+def _loads(data):
+    try:
+        import orjson
+    except ImportError:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+def _compress(data, compression):
+    if compression == 'zlib':
+        return zlib.compress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    if compression == 'lz4':
+        import lz4.frame
+        return lz4.frame.compress(data)
+    return data
+
+
+def _decompress(data, compression):
+    if compression == 'zlib':
+        return zlib.decompress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    if compression == 'lz4':
+        import lz4.frame
+        return lz4.frame.decompress(data)
+    return data
+
+
+def _open(fp):
+    '''
+    Читает заголовок и возвращает (формат, поток распакованных данных без заголовка)
+    '''
+    prefix = b''
+    while len(prefix) < HEADER_SIZE:
+        chunk = fp.read(HEADER_SIZE - len(prefix))
+        if not chunk:
+            break
+        prefix += chunk
+
+    format, compression = header(prefix)
+    if not prefix.startswith(MAGIC):
+        # старый JSON: прочитанное начало возвращается в поток
+        return format, _Prefixed(prefix, fp)
+
+    if compression == 'zlib':
+        return format, _ZlibReader(fp)
+    if compression == 'zstd':
+        import zstandard
+        return format, zstandard.ZstdDecompressor().stream_reader(fp)
+    if compression == 'lz4':
+        import lz4.frame
+        return format, lz4.frame.LZ4FrameFile(fp, mode='rb')
+    return format, fp
+
+
+def _read_all(stream, chunk_size):
+    chunks = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+class _Prefixed:
+    '''
+    Поток, перед которым вставлены уже прочитанные байты
+    '''
+    def __init__(self, prefix, fp):
+        self.__prefix = prefix
+        self.__fp = fp
+
+    def read(self, size):
+        if self.__prefix:
+            chunk, self.__prefix = self.__prefix[:size], self.__prefix[size:]
+            return chunk
+        return self.__fp.read(size)
+
+
+class _ZlibReader:
+    '''
+    Распаковка zlib на лету: read(size) возвращает не больше size распакованных байт
+    '''
+    def __init__(self, fp):
+        self.__fp = fp
+        self.__decompressor = zlib.decompressobj()
+
+    def read(self, size):
+        while True:
+            data = self.__decompressor.unconsumed_tail
+            if not data:
+                data = self.__fp.read(size)
+                if not data:
+                    return self.__decompressor.flush()
+            chunk = self.__decompressor.decompress(data, size)
+            if chunk:
+                return chunk
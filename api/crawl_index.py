@@ -0,0 +1,96 @@
+class CrawlIndex:
+    '''
+    Компактный индекс кейса: пользователи пронумерованы плотными целыми числами (в порядке первого появления)
+    Строится за один проход по постам, все поиски по id - O(1)
+    ids, first_name, last_name - параллельные массивы по номеру пользователя
+    sources, targets - ребра (автор поста -> автор комментария) в номерах, weighted_edges() - без повторов, с весами
+    replies, reply_offsets, reply_order - комментарии пользователя i: replies[reply_order[reply_offsets[i]:reply_offsets[i + 1]]]
+    '''
+    def __init__(self, data):
+        import numpy as np
+
+        self.index = {}
+        self.ids = []
+        self.first_name = []
+        self.last_name = []
+        self.replies = []
+        # откуда взято имя: 0 - нет, 1 - из комментария, 2 - из поста (имя автора поста приоритетнее)
+        self.__name_source = []
+
+        sources, targets, reply_sender = [], [], []
+        for post in data['vk'][0]['posts']:
+            author = post.get('from')
+            if author is not None:
+                a = self.__add(author['id'])
+                self.__name(a, author['first_name'], author['last_name'], 2)
+
+            for reply in post.get('replies', ()):
+                r = self.__add(reply['sender_id'])
+                self.__name(r, reply['sender_name'], reply['last_name'], 1)
+                reply_sender.append(r)
+                self.replies.append(reply)
+                if author is not None:
+                    sources.append(a)
+                    targets.append(r)
+
+        self.sources = np.array(sources, dtype=np.int64)
+        self.targets = np.array(targets, dtype=np.int64)
+        reply_sender = np.array(reply_sender, dtype=np.int64)
+        self.reply_order = np.argsort(reply_sender, kind='stable')
+        self.reply_offsets = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(reply_sender, minlength=len(self.ids)), out=self.reply_offsets[1:])
+
+    def __add(self, user_id):
+        i = self.index.get(user_id)
+        if i is None:
+            i = self.index[user_id] = len(self.ids)
+            self.ids.append(user_id)
+            self.first_name.append(None)
+            self.last_name.append(None)
+            self.__name_source.append(0)
+        return i
+
+    def __name(self, i, first_name, last_name, source):
+        if self.__name_source[i] < source:
+            self.first_name[i], self.last_name[i] = first_name, last_name
+            self.__name_source[i] = source
+
+    def __len__(self):
+        return len(self.ids)
+
+    def info(self, i):
+        '''
+        Имя пользователя с номером i {'first_name': ..., 'last_name': ...}
+        '''
+        return {'first_name': self.first_name[i], 'last_name': self.last_name[i]}
+
+    def nodes(self):
+        '''
+        Номера пользователей, у которых есть ребра, в порядке первого появления в ребрах (как при G.add_edges_from)
+        '''
+        import numpy as np
+
+        edges = np.empty(2 * len(self.sources), dtype=np.int64)
+        edges[0::2], edges[1::2] = self.sources, self.targets
+        nodes, first = np.unique(edges, return_index=True)
+        return nodes[np.argsort(first)]
+
+    def replies_of(self, user_id):
+        '''
+        Комментарии пользователя в порядке обхода кейса
+        '''
+        i = self.index.get(user_id)
+        if i is None:
+            return []
+        return [self.replies[j] for j in self.reply_order[self.reply_offsets[i]:self.reply_offsets[i + 1]].tolist()]
+
+    def weighted_edges(self):
+        '''
+        Ребра без повторов с числом повторов в качестве веса (sources, targets, weights), в порядке первого появления
+        '''
+        import numpy as np
+
+        keys = self.sources * len(self.ids) + self.targets
+        unique, first, weights = np.unique(keys, return_index=True, return_counts=True)
+        order = np.argsort(first)
+        return self.sources[first[order]], self.targets[first[order]], weights[order]
@@ -0,0 +1,209 @@
+import codecs
+import json
+import re
+from columns import ColumnsGroup, CrawlColumns
+
+CHUNK_SIZE = 1 << 16
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+class Crawl(dict):
+    '''
+    Кейс краулинга, прочитанный crawl_stream/crawl_codec: граф взаимодействий хранится в атрибуте graph
+    (см. graph.get_graph) и живет, пока жив кейс
+    Остается обычным словарем для JSON: граф в него не записывается
+    '''
+    graph = None
+
+
+def as_crawl(crawl):
+    '''
+    Кейс из обычных словарей (json.loads, msgpack) с типами Crawl и ColumnsGroup, как у кейса из CrawlReader
+    Копируются только верхние уровни (кейс и списки сообществ), посты остаются теми же объектами
+    '''
+    if isinstance(crawl, list):
+        return [as_crawl(item) for item in crawl]
+    crawl = Crawl(crawl)
+    for key, value in crawl.items():
+        if isinstance(value, list):
+            crawl[key] = [ColumnsGroup(group) if isinstance(group, dict) else group for group in value]
+    return crawl
+
+
+class CrawlReader:
+    '''
+    Потоковый разбор кейса из файла (текстового или бинарного, utf-8) без чтения его в память целиком
+    groups() выдает сообщества (ColumnsGroup) по одному: (сеть, сообщество), где сообщество['posts'] - генератор постов,
+    разбираемых по мере чтения; поля сообщества после постов ('from', 'to', ...) появляются после того, как посты прочитаны
+    В памяти одновременно - один пост и буфер чтения; после groups() в crawl - кейс (Crawl или list из Crawl, как в файле)
+    с сообществами без непрочитанных постов
+    '''
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.crawl = None
+        self.__fp = fp
+        self.__chunk_size = chunk_size
+        self.__decoder = json.JSONDecoder()
+        self.__utf8 = None
+        self.__buffer = ''
+        self.__pos = 0
+        self.__eof = False
+
+    def groups(self):
+        if self.__peek() == '[':
+            self.crawl = []
+            for _ in self.__items():
+                crawl = Crawl()
+                self.crawl.append(crawl)
+                yield from self.__crawl(crawl)
+        else:
+            self.crawl = Crawl()
+            yield from self.__crawl(self.crawl)
+
+    def __crawl(self, crawl):
+        for key in self.__members():
+            if self.__peek() != '[':
+                crawl[key] = self.__value()
+                continue
+
+            crawl[key] = []
+            for _ in self.__items():
+                if self.__peek() != '{':
+                    crawl[key].append(self.__value())
+                    continue
+                group = ColumnsGroup()
+                crawl[key].append(group)
+                yield from self.__group(key, group)
+
+    def __group(self, network, group):
+        posts = None
+        for key in self.__members():
+            if key == 'posts' and self.__peek() == '[':
+                posts = group['posts'] = self.__posts()
+                yield network, group
+                # непрочитанные получателем посты пропускаются
+                for _ in posts:
+                    pass
+            else:
+                group[key] = self.__value()
+        if posts is None:
+            yield network, group
+
+    def __posts(self):
+        for _ in self.__items():
+            yield self.__value()
+
+    def __items(self):
+        '''
+        Обход массива: на каждом шаге получатель разбирает очередной элемент
+        '''
+        self.__expect('[')
+        if self.__peek() == ']':
+            self.__pos += 1
+            return
+        while True:
+            yield
+            if self.__separator(']'):
+                return
+
+    def __members(self):
+        '''
+        Обход объекта: выдает ключи, значение разбирает получатель
+        '''
+        self.__expect('{')
+        if self.__peek() == '}':
+            self.__pos += 1
+            return
+        while True:
+            key = self.__value()
+            if not isinstance(key, str):
+                raise ValueError('Ожидался ключ объекта, позиция %d' % self.__pos)
+            self.__expect(':')
+            yield key
+            if self.__separator('}'):
+                return
+
+    def __separator(self, end):
+        c = self.__peek()
+        self.__pos += 1
+        if c == end:
+            return True
+        if c != ',':
+            raise ValueError('Ожидалось "," или "%s", получено "%s"' % (end, c))
+        return False
+
+    def __expect(self, c):
+        if self.__peek() != c:
+            raise ValueError('Ожидалось "%s", получено "%s"' % (c, self.__peek()))
+        self.__pos += 1
+
+    def __peek(self):
+        '''
+        Следующий значимый символ (пробелы пропускаются)
+        '''
+        while True:
+            self.__pos = _whitespace.match(self.__buffer, self.__pos).end()
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self.__read(self.__chunk_size):
+                raise ValueError('Неожиданный конец кейса')
+
+    def __value(self):
+        '''
+        Очередное значение целиком (пост, строка, число, ...) через json
+        '''
+        self.__peek()
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__pos)
+                # число в конце буфера может быть обрезано - значение должно заканчиваться до конца буфера
+                if end < len(self.__buffer) or self.__eof:
+                    self.__pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.__eof:
+                    raise
+            # значение не поместилось: буфер увеличивается вдвое, чтобы большой пост не разбирался заново много раз
+            self.__read(max(self.__chunk_size, len(self.__buffer) - self.__pos))
+
+    def __read(self, size):
+        '''
+        Дочитывает size символов в буфер, разобранная часть буфера отбрасывается; False - файл закончился
+        '''
+        if self.__eof:
+            return False
+        chunk = self.__fp.read(size)
+        if isinstance(chunk, bytes):
+            if self.__utf8 is None:
+                self.__utf8 = codecs.getincrementaldecoder('utf-8')()
+            text = self.__utf8.decode(chunk, final=not chunk)
+        else:
+            text = chunk
+        self.__eof = not chunk
+        self.__buffer = self.__buffer[self.__pos:] + text
+        self.__pos = 0
+        return True
+
+
+def load_crawl(fp, chunk_size=CHUNK_SIZE):
+    '''
+    Кейс из файла - то же, что json.load, но без одновременного хранения в памяти исходного текста и разобранного кейса
+    '''
+    reader = CrawlReader(fp, chunk_size)
+    for network, group in reader.groups():
+        if 'posts' in group:
+            group['posts'] = list(group['posts'])
+    return reader.crawl
+
+
+def load_columns(fp, chunk_size=CHUNK_SIZE):
+    '''
+    Кейс из файла в колоночном представлении: посты каждого сообщества сразу складываются в CrawlColumns
+    (атрибут columns сообщества, см. get_columns), сами посты не сохраняются
+    '''
+    reader = CrawlReader(fp, chunk_size)
+    for network, group in reader.groups():
+        if 'posts' in group:
+            group.columns = CrawlColumns(group)
+            del group['posts']
+    return reader.crawl
@@ -1,7 +1,7 @@
-import emoji
-from collections import Counter
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
-# from transformers import pipeline
+from annotation import annotate_groups
+from columns import get_columns
 
 # 2
 def audience_coverage(data):
@@ -15,17 +15,15 @@ def audience_coverage(data):
     total_views = 0
 
     for item in data:
-        valid_posts = [post for post in item["posts"] if post["views"] is not None] 
-        total_views += sum([post["views"] for post in valid_posts])
+        columns = get_columns(item)
+        total_views += int(columns.views.sum())
         
-        likes_comments = sum([reaction['count'] for post in item['posts'] for comment in post.get('replies', []) for reaction in comment.get('reactions', [])])
-        total_likes = sum(reaction['count'] for post in item['posts'] for reaction in post['reactions']) + likes_comments
+        likes_comments = int(columns.reply_reactions.sum())
+        total_likes = int(columns.reaction_count.sum()) + likes_comments
         
-        reposts = sum(post.get('forwards', 0) for post in item['posts'])  
+        reposts = int(columns.forwards.sum())
 
-        unique_sender_ids = set(comment['sender_id'] for post in item['posts'] for comment in post.get('replies', []))
-
-        total_comments += len(unique_sender_ids)
+        total_comments += columns.unique_senders()
         total_interactions += total_likes + total_comments + reposts + total_views
         
         start_date = datetime.strptime(item["from"], "%d/%m/%Y")
@@ -48,9 +46,9 @@ def channel_citation_index(data):
     total_reposts = 0
 
     for item in data:
-        valid_posts = [post for post in item["posts"] if post["views"] is not None] 
-        total_views += sum([post["views"] for post in valid_posts])
-        total_reposts = sum(post.get('forwards', 0) for post in item['posts'])  
+        columns = get_columns(item)
+        total_views += int(columns.views.sum())
+        total_reposts = int(columns.forwards.sum())
 
     if total_views > 0 and total_reposts > 0:
         channel_citation_index = (total_reposts / total_views) * 100
@@ -64,14 +62,12 @@ def net_promoter_score(data):
     Лояльность пользователей (Net Promoter Score)
     ((Положительные комментарии - Негативные комментарии) / Всего комментариев) * 100%
     """
-    # https://huggingface.co/blanchefort/rubert-base-cased-sentiment модель для анализа тональности
-    classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
+    annotate_groups(data)
 
     for item in data:
-        total_messages = [post['text'] for post in item['posts'] for post in post['replies'] if post['text'] is not None]
-        len_total_messages = len(total_messages)
+        classified_messages = [reply['annotated_sentiment'] for post in item['posts'] for reply in post['replies'] if reply['text'] is not None]
+        len_total_messages = len(classified_messages)
         
-        classified_messages = classifier(total_messages)
         positive_count = sum(1 for i in classified_messages if i['label'] == 'POSITIVE')
         negative_count = sum(1 for i in classified_messages if i['label'] == 'NEGATIVE')
 
@@ -91,9 +87,10 @@ def love_rate(data):
     total_likes = 0
 
     for j in data:
-        valid_posts = [post for post in j["posts"] if post["views"] is not None] # только те посты, где просмотры != None
-        total_views += sum([post["views"] for post in valid_posts])
-        total_likes += sum([reaction["count"] for post in valid_posts for reaction in post["reactions"] if reaction["emoji"] == "like"])
+        columns = get_columns(j)
+        # только те посты, где просмотры != None (у остальных views = 0)
+        total_views += int(columns.views.sum())
+        total_likes += int(columns.reactions('like')[columns.has_views].sum())
 
     if total_views > 0 and total_likes > 0:
         love_rate = (total_likes / total_views) * 100
@@ -110,8 +107,14 @@ def discussion_rate(data):
 
     result = []
 
+    annotate_groups(data, sentiment=False)
 
     for item in data:
+        # отправители комментариев по дням публикации постов
+        comments_by_day = defaultdict(list)
+        for post in item['posts']:
+            comments_by_day[post['day']].extend(comment['sender_id'] for comment in post.get('replies', []))
+
         start_date = datetime.strptime(item['from'], "%d/%m/%Y")
         end_date = datetime.strptime(item['to'], "%d/%m/%Y")
         days_interval_length = (end_date - start_date).days + 1
@@ -120,7 +123,7 @@ def discussion_rate(data):
         for i in range(days_interval_length):
             cur_date = (start_date + i * delta_day).strftime("%d/%m/%Y")
 
-            comments = [comment['sender_id'] for post in item['posts'] if (datetime.fromtimestamp(post['date']).strftime("%d/%m/%Y") == cur_date) for comment in post.get('replies', [])]
+            comments = comments_by_day.get(cur_date, [])
 
            
             
@@ -145,8 +148,6 @@ def character_length(data):
     lists = []
     results = []
     
-    classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-    
     # диапазоны длин символов
     dict_lengths = {1: '0-10', 2: '11-50', 3: '51-100', 4: '101-200', 5: '201+'}
 
@@ -158,35 +159,26 @@ def character_length(data):
         dict_lengths[5]: [] 
     }
 
+    annotate_groups(data)
+
     for group in data:
         for post in group['posts']:
             for reply in post['replies']:
                 if reply['text'] != None:
-                    comment_length = len(reply['text'])
-                    if comment_length < int(dict_lengths[1].split('-')[1])+1:
-                        comments_lengths[dict_lengths[1]].append(reply['text'])
-                    elif int(dict_lengths[1].split('-')[1])+1 <= comment_length <= int(dict_lengths[2].split('-')[1])+1:
-                        comments_lengths[dict_lengths[2]].append(reply['text'])
-                    elif int(dict_lengths[2].split('-')[1])+1 <= comment_length <= int(dict_lengths[3].split('-')[1])+1:
-                        comments_lengths[dict_lengths[3]].append(reply['text'])
-                    elif int(dict_lengths[3].split('-')[1])+1 <= comment_length <= int(dict_lengths[4].split('-')[1])+1:
-                        comments_lengths[dict_lengths[4]].append(reply['text'])
-                    else:
-                        comments_lengths[dict_lengths[5]].append(reply['text'])
+                    comments_lengths[reply['length_bucket']].append(reply['annotated_sentiment'])
 
     for lengths in comments_lengths.keys():
-        lists.append([classifier(_) for _ in comments_lengths[lengths]])
+        lists.append(comments_lengths[lengths])
         
     length_keys = dict_lengths.values()
 
     for list in lists:
-        total_score = sum(dict['score'] for sublist in list for dict in sublist)
+        total_score = sum(dict['score'] for dict in list)
 
         distribution = {'positive': 0, 'negative': 0, 'neutral': 0} 
         if total_score != 0:
-            for sublist in list:
-                for dict in sublist:
-                    distribution[dict['label'].lower()] += (dict['score'] / total_score) * 100
+            for dict in list:
+                distribution[dict['label'].lower()] += (dict['score'] / total_score) * 100
 
         results.append(distribution)
 
@@ -202,18 +194,14 @@ def top_emoji(data):
     Топ-5 эмодзи
     [эмодзи | количество упоминаний эмодзи в комментариях]
     '''
-    def extract_emojis(text):
-        return ''.join(c for c in text if emoji.is_emoji(c))
-
     emoji_counter = Counter()
 
+    annotate_groups(data, sentiment=False)
+
     for group in data:
-        messages = (reply['text'] for post in group['posts'] 
-                    for reply in post['replies'] if reply['text'] is not None)
-        
-        for message in messages:
-            emojis = extract_emojis(message)
-            emoji_counter.update(emojis)
+        for post in group['posts']:
+            for reply in post['replies']:
+                emoji_counter.update(reply['emojis'])
 
     top_emojis = dict(emoji_counter.most_common(5))       
     return top_emojis  
\ No newline at end of file
@@ -0,0 +1,236 @@
+import hashlib
+import os
+import threading
+from centrality import PARALLEL_MIN_NODES, WORKERS, approximate_betweenness, parallel_betweenness
+from crawl_index import CrawlIndex
+from graph_layout import multilevel_layout
+from object_cache import ObjectCache
+from pagerank import IncrementalPageRank, apply_delta
+
+# графы последних GRAPH_CACHE_SIZE кейсов - обычных словарей, не прочитанных crawl_stream/crawl_codec
+GRAPH_CACHE_SIZE = int(os.environ.get('GRAPH_CACHE_SIZE', 8))
+
+
+class InteractionGraph:
+    '''
+    Граф взаимодействий кейса (автор поста -> автор комментария)
+    Строится один раз на кейс, центральности считаются при первом обращении и запоминаются
+    '''
+    def __init__(self, data):
+        # граф не держит ссылку на кейс: граф хранится в самом кейсе (get_graph), кейс освобождается без сборщика циклов
+        self.sender_id, self.sender_info, self.connections = self.__get_data(data)
+        self.__graph = None
+        self.__pagerank = {}
+        self.__ranker = None
+        self.__updated = False
+        self.__degree = None
+        self.__edge_hash = None
+        self.__weighted_edges = None
+        self.__betweenness_centrality = {}
+        self.__layout = {}
+        self.__lock = threading.Lock()
+        self.__locks = {}
+
+    def __once(self, name, key, memo, compute):
+        '''
+        memo[key] = compute() один раз: одновременные запросы (например, /influencers_analysis и /brand_rating
+        по одному кейсу) ждут первый расчет, а не считают то же самое заново
+        '''
+        if key not in memo:
+            with self.__key_lock(name, key):
+                if key not in memo:
+                    memo[key] = compute()
+        return memo[key]
+
+    def __key_lock(self, name, key=None):
+        with self.__lock:
+            return self.__locks.setdefault((name, key), threading.Lock())
+
+    def __get_data(self, data):
+        '''
+        sender_id - узлы (id пользователей)
+        sender_info - (словарь с id в качестве ключа и значений в качестве словаря из first_name и last_name)
+        connections - ребра (id-to-id)
+        '''
+        # все поиски по id идут через индекс кейса (crawl_index.py), построенный за один проход
+        self.index = CrawlIndex(data)
+        ids = self.index.ids
+        nodes = self.index.nodes().tolist()
+
+        sender_id = [ids[i] for i in nodes]
+        sender_info = {ids[i]: self.index.info(i) for i in nodes}
+        connections = [(ids[u], ids[v]) for u, v in zip(self.index.sources.tolist(), self.index.targets.tolist())]
+        return sender_id, sender_info, connections
+
+    def weighted_edges(self):
+        '''
+        Ребра без повторов [(id, id, число комментариев), ...] в порядке первого появления
+        '''
+        if self.__weighted_edges is None:
+            if self.__updated:
+                counts = {}
+                for edge in self.connections:
+                    counts[edge] = counts.get(edge, 0) + 1
+                self.__weighted_edges = [(u, v, w) for (u, v), w in counts.items()]
+            else:
+                ids = self.index.ids
+                sources, targets, weights = self.index.weighted_edges()
+                self.__weighted_edges = [(ids[u], ids[v], w) for u, v, w in zip(sources.tolist(), targets.tolist(), weights.tolist())]
+        return self.__weighted_edges
+
+    @property
+    def G(self):
+        '''
+        networkx.DiGraph с именами пользователей в атрибутах узлов
+        Повторные ребра склеены: weight - число комментариев, distance = 1 / weight (длина для кратчайших путей)
+        '''
+        if self.__graph is None:
+            with self.__key_lock('G'):
+                if self.__graph is None:
+                    import networkx as nx
+                    G = nx.DiGraph()
+                    G.add_nodes_from((k, self.sender_info[k]) for k in self.sender_id)
+                    G.add_edges_from((u, v, {'weight': w, 'distance': 1 / w}) for u, v, w in self.weighted_edges())
+                    self.__graph = G
+        return self.__graph
+
+    def pagerank(self, previous=None, weighted=False):
+        '''
+        pagerank всех узлов {722219350: 0.04746, ...}
+        previous - pagerank прошлого краулинга этого же сообщества (теплый старт, меньше итераций)
+        weighted - с весами ребер (число комментариев), иначе повторные ребра склеиваются
+        '''
+        # считается на разреженной матрице (pagerank.py), совпадает с nx.pagerank
+        return self.__once('pagerank', weighted, self.__pagerank, lambda: self.__get_ranker(previous).ranks(weighted))
+
+    def __get_ranker(self, previous):
+        if self.__ranker is None:
+            with self.__key_lock('ranker'):
+                if self.__ranker is None:
+                    self.__ranker = IncrementalPageRank(self.sender_id, self.connections, previous, indexed=self.__indexed_edges())
+        return self.__ranker
+
+    def degree(self, user_id):
+        '''
+        Число взаимодействий пользователя - ребер, в которых он участвует (с повторами)
+        '''
+        if self.__degree is None:
+            if self.__updated:
+                degree = {}
+                for u, v in self.connections:
+                    degree[u] = degree.get(u, 0) + 1
+                    if v != u:
+                        degree[v] = degree.get(v, 0) + 1
+            else:
+                import numpy as np
+                sources, targets = self.index.sources, self.index.targets
+                counts = np.bincount(sources, minlength=len(self.index)) + np.bincount(targets, minlength=len(self.index))
+                counts -= np.bincount(sources[sources == targets], minlength=len(self.index))
+                degree = dict(zip(self.index.ids, counts.tolist()))
+            self.__degree = degree
+        return self.__degree.get(user_id, 0)
+
+    def __indexed_edges(self):
+        '''
+        Ребра в номерах узлов sender_id (из индекса кейса, без обхода connections); None после update()
+        '''
+        import numpy as np
+
+        if self.__updated:
+            return None
+        position = np.full(len(self.index), -1, dtype=np.int64)
+        position[self.index.nodes()] = np.arange(len(self.sender_id))
+        return position[self.index.sources], position[self.index.targets]
+
+    def update(self, added=(), removed=(), sender_info=None):
+        '''
+        Изменение графа без повторного построения: added/removed - ребра (id-to-id),
+        sender_info - имена новых пользователей (как в self.sender_info)
+        pagerank пересчитывается с прошлого значения, остальные метрики - при следующем обращении
+        '''
+        # индекс кейса описывает ребра до изменения
+        self.__updated = True
+        self.__degree = None
+        self.__edge_hash = None
+        self.__weighted_edges = None
+        self.connections = apply_delta(self.connections, added, removed)
+        self.sender_id = list(dict.fromkeys(node for edge in self.connections for node in edge))
+        for node in self.sender_id:
+            if node not in self.sender_info:
+                self.sender_info[node] = (sender_info or {}).get(node, {'first_name': '', 'last_name': ''})
+
+        self.__graph = None
+        if self.__ranker is not None:
+            self.__ranker.apply(added, removed)
+            self.__pagerank = {weighted: self.__ranker.ranks(weighted) for weighted in self.__pagerank}
+        self.__betweenness_centrality = {}
+        self.__layout = {}
+
+    def betweenness_centrality(self, mode='exact', pivots=None, epsilon=None, top_k=10, seed=0, weighted=False):
+        '''
+        betweenness centrality всех узлов {722219350: 0.04746, ...} (параметры - см. betweenness)
+        '''
+        return self.betweenness(mode, pivots, epsilon, top_k, seed, weighted)[0]
+
+    def betweenness(self, mode='exact', pivots=None, epsilon=None, top_k=10, seed=0, weighted=False):
+        '''
+        betweenness centrality всех узлов и параметры расчета (centrality, info)
+        mode='exact' - точный расчет (на больших графах - по компонентам связности в пуле процессов, centrality.parallel_betweenness),
+        mode='approximate' - по выборке опорных вершин (centrality.approximate_betweenness)
+        weighted - кратчайшие пути по длинам 1 / число комментариев (сильные связи короче), только для mode='exact'
+        '''
+        key = (mode, weighted) if mode == 'exact' else (mode, pivots, epsilon, top_k, seed)
+        return self.__once('betweenness', key, self.__betweenness_centrality,
+                           lambda: self.__compute_betweenness(mode, pivots, epsilon, top_k, seed, weighted))
+
+    def __compute_betweenness(self, mode, pivots, epsilon, top_k, seed, weighted):
+        if weighted and mode != 'exact':
+            raise ValueError('Weighted betweenness is supported only in exact mode')
+        if weighted:
+            import networkx as nx
+            centrality = nx.betweenness_centrality(self.G, weight='distance')
+            return centrality, {'mode': 'exact', 'pivots': len(centrality), 'nodes': len(centrality), 'weighted': True}
+        if mode == 'exact' and WORKERS > 1 and len(self.G) >= PARALLEL_MIN_NODES:
+            return parallel_betweenness(self.G)
+        if mode == 'exact':
+            # https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.centrality.betweenness_centrality.html
+            import networkx as nx
+            centrality = nx.betweenness_centrality(self.G)
+            return centrality, {'mode': 'exact', 'pivots': len(centrality), 'nodes': len(centrality)}
+        if mode == 'approximate':
+            return approximate_betweenness(self.G, pivots, epsilon, top_k, seed)
+        raise ValueError('Unknown betweenness mode: %s' % mode)
+
+    def edge_hash(self):
+        '''
+        Хеш множества ребер (порядок и повторы не важны) - ключ для кеша картинок графа
+        '''
+        if self.__edge_hash is None:
+            self.__edge_hash = hashlib.sha1(repr(sorted(set(self.connections))).encode('utf-8')).hexdigest()
+        return self.__edge_hash
+
+    def layout(self, nodes=None):
+        '''
+        Координаты узлов для отрисовки графа (нужны только при рендеринге картинок)
+        nodes - раскладка только подграфа на этих узлах для больших графов (graph_layout.neighbourhood, multilevel_layout)
+        '''
+        # spring_layout - https://networkx.org/documentation/stable/reference/generated/networkx.drawing.layout.spring_layout.html
+        key = None if nodes is None else frozenset(nodes)
+        if key not in self.__layout:
+            if nodes is None:
+                import networkx as nx
+                self.__layout[key] = nx.spring_layout(self.G, k=0.15, iterations=20)
+            else:
+                self.__layout[key] = multilevel_layout(self.G.subgraph(nodes), k=0.15, iterations=20)
+        return self.__layout[key]
+
+
+_graphs = ObjectCache(GRAPH_CACHE_SIZE, 'graph')
+
+
+def get_graph(data):
+    '''
+    Граф кейса (создается при первом обращении и запоминается для этого объекта кейса, чтобы все метрики использовали один граф;
+    граф кейса crawl_stream.Crawl живет, пока жив кейс)
+    '''
+    return _graphs.get(data, InteractionGraph)
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from topk import top_items
+
+LAYOUT_MAX_NODES = int(os.environ.get('GRAPH_LAYOUT_MAX_NODES', 2000))
+
+
+def neighbourhood(G, values, top_k, max_nodes=LAYOUT_MAX_NODES):
+    '''
+    Узлы для отрисовки большого графа: top_k узлов по values и их окрестность - соседи, затем соседи соседей и т.д.
+    (на каждом шаге сначала с большим значением), всего не больше max_nodes; граф не больше max_nodes рисуется целиком
+    '''
+    if len(G) <= max_nodes:
+        return list(G)
+
+    frontier = [node for node, value in top_items(values, min(top_k, max_nodes))]
+    selected = dict.fromkeys(frontier)
+    while frontier and len(selected) < max_nodes:
+        neighbours = set()
+        for node in frontier:
+            neighbours.update(G.succ[node])
+            neighbours.update(G.pred[node])
+        neighbours.difference_update(selected)
+        frontier = [node for node, value in top_items({node: values.get(node, 0) for node in neighbours}, max_nodes - len(selected))]
+        selected.update(dict.fromkeys(frontier))
+    return list(selected)
+
+
+def multilevel_layout(G, k=0.15, iterations=20):
+    '''
+    Двухуровневая раскладка большого графа: spring_layout только для ядра (узлы с двумя и более соседями),
+    висячие узлы (комментаторы одного автора - большинство узлов) - по кругу вокруг своего соседа
+    '''
+    import networkx as nx
+
+    U = nx.Graph(G)
+    U.remove_edges_from(nx.selfloop_edges(U))
+    children = {}
+    for node in U:
+        if U.degree(node) == 1:
+            parent = next(iter(U[node]))
+            if U.degree(parent) > 1:
+                children.setdefault(parent, []).append(node)
+
+    leaves = set(node for group in children.values() for node in group)
+    pos = nx.spring_layout(U.subgraph(node for node in U if node not in leaves), k=k, iterations=iterations)
+
+    radius = k / 3
+    for parent, group in children.items():
+        x, y = pos[parent]
+        for i, node in enumerate(group):
+            angle = 2 * math.pi * i / len(group)
+            pos[node] = (x + radius * math.cos(angle), y + radius * math.sin(angle))
+    return {node: pos[node] for node in G}
+
+
+def cached_layout(graph, nodes, directory):
+    '''
+    Координаты узлов nodes графа (graph.layout), сохраняются на диск по хешу ребер графа и набора узлов
+    '''
+    key = hashlib.sha1(('%s:%s' % (graph.edge_hash(), sorted(nodes))).encode('utf-8')).hexdigest()
+    path = os.path.join(directory, key + '.layout.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            return {node: (x, y) for node, x, y in json.load(f)}
+
+    pos = graph.layout(nodes if len(nodes) < len(graph.G) else None)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, threading.get_ident())
+    with open(tmp_path, 'w') as f:
+        json.dump([[node, float(x), float(y)] for node, (x, y) in pos.items()], f)
+    os.replace(tmp_path, path)
+    return pos
@@ -1,5 +1,8 @@
-from transformers import pipeline
-import networkx as nx
+import json
+from annotation import annotate_groups
+from graph import get_graph
+from rendering import render_ranking
+from topk import top_k, top_items
 
 class InfluencerTable:
     '''
@@ -11,6 +14,7 @@ class InfluencerTable:
         self.person = person
         
     def __get_data(self):
+        annotate_groups(self.data['vk'])
         dt = {}  
 
         for post in self.data['vk'][0]['posts']:
@@ -22,7 +26,7 @@ class InfluencerTable:
                         'last_name': post['from']['last_name'],
                         'likes': post['reactions'][0]['count'],
                         'messages': 1,
-                        'comments': [reply['text'] for reply in post['replies']],
+                        'comments': list(post['replies']),
                         'reposts': post['forwards'],
                         'followers': self.data['vk'][0]['membersCount']
                     }
@@ -30,7 +34,7 @@ class InfluencerTable:
                     dt[post_id]['messages'] += 1
                     dt[post_id]['likes'] += post['reactions'][0]['count']
                     dt[post_id]['reposts'] += post['forwards']
-                    dt[post_id]['comments'].extend([reply['text'] for reply in post['replies']])
+                    dt[post_id]['comments'].extend(post['replies'])
                 
         return dt
             
@@ -39,8 +43,8 @@ class InfluencerTable:
         ФИО пользователей с наибольшим числом инициированных постов
         '''
         self.data = self.__get_data()
-        sorted_data = sorted(self.data.values(), key=lambda x: x['messages'], reverse=True)
-        authors_names = {v['first_name'] + ' ' + v['last_name']: v['messages'] for v in sorted_data[:self.person]}
+        top_users = top_k(self.data.values(), self.person, key=lambda x: x['messages'])
+        authors_names = {v['first_name'] + ' ' + v['last_name']: v['messages'] for v in top_users}
         return authors_names # словарь {'first_name last_name': messages}, где messages - количество постов, инициированных данным пользователем
     
     def engagement_rate_by_reach(self):
@@ -48,11 +52,11 @@ class InfluencerTable:
         Коэффициент вовлеченности (Engagement Rate By Reach)
         (Общее число взаимодействий / Общее количество подписчиков сообщества) * 100%
         '''
-        sorted_data = sorted(self.data.values(), key=lambda x: x['messages'], reverse=True)
+        top_users = top_k(self.data.values(), self.person, key=lambda x: x['messages'])
 
         engagement_rates = {
             v['first_name'] + ' ' + v['last_name']: round(((v['likes'] + v['reposts'] + len(v['comments'])) / v['followers']) * 1000, 3) 
-            for v in sorted_data[:self.person] if v['followers'] != 0
+            for v in top_users if v['followers'] != 0
         }
         return engagement_rates # словарь {'first_name last_name': engagement_rate_by_reach}, engagement_rate_by_reach - вовлеченность
     
@@ -61,9 +65,7 @@ class InfluencerTable:
         Лояльность пользователей (Net Promoter Score)
         ((Положительные комментарии - Негативные комментарии) / Всего комментариев) * 100%
         """
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment") 
-        
-        top_users = sorted(self.data.values(), key=lambda x: x['messages'], reverse=True)[:self.person]
+        top_users = top_k(self.data.values(), self.person, key=lambda x: x['messages'])
         loyalty_scores = []
         
         for user in top_users:
@@ -71,10 +73,10 @@ class InfluencerTable:
             negative_count = 0
             
             for comment in user['comments']:
-                classified_comment = classifier(comment)
-                if classified_comment[0]['label'] == 'POSITIVE':
+                classified_comment = comment['annotated_sentiment']
+                if classified_comment['label'] == 'POSITIVE':
                     positive_count += 1
-                elif classified_comment[0]['label'] == 'NEGATIVE':
+                elif classified_comment['label'] == 'NEGATIVE':
                     negative_count += 1
             
             total_comments = len(user['comments'])
@@ -127,6 +129,7 @@ class InfluencerTableNegative:
         self.__engagement_rate_by_reach()
 
     def __get_data(self):
+        annotate_groups(self.data['vk'])
         dt = {}  
 
         for post in self.data['vk'][0]['posts']:
@@ -138,7 +141,7 @@ class InfluencerTableNegative:
                         'last_name': post['from']['last_name'],
                         'likes': post['reactions'][0]['count'],
                         'messages': 1,
-                        'comments': [reply['text'] for reply in post['replies']],
+                        'comments': list(post['replies']),
                         'reposts': post['forwards'],
                         'followers': self.data['vk'][0]['membersCount'],
                         'post': post['text']
@@ -149,8 +152,6 @@ class InfluencerTableNegative:
     def __analyze_comments(self):
         self.data = self.__get_data()
         
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
-        
         for id, info in self.data.items():
             pos_count = 0
             neg_count = 0
@@ -158,8 +159,7 @@ class InfluencerTableNegative:
             total_count = 0
             
             for comment in info['comments']:
-                result = classifier(comment)
-                sentiment = result[0]['label']
+                sentiment = comment['annotated_sentiment']['label']
                 
                 if sentiment == 'NEGATIVE':
                     neg_count += 1
@@ -178,8 +178,7 @@ class InfluencerTableNegative:
             info['negative_percentage'] = neg_perc
             info['neutral_percentage'] = neu_perc
 
-        sorted_data = sorted(self.data.items(), key=lambda x: x[1]['negative_percentage'], reverse=True)
-        self.neg_posts = sorted_data[:self.top_neg_posts]
+        self.neg_posts = top_k(self.data.items(), self.top_neg_posts, key=lambda x: x[1]['negative_percentage'])
     
     def __engagement_rate_by_reach(self):
         '''
@@ -219,63 +218,24 @@ class PageRank:
     Топ-10 авторов с наибольшей способностью вовлекать других пользователей в дискуссию
     [пользователь | значение page rank]
     '''
-    def __init__(self, data, top_authors=10):
+    def __init__(self, data, top_authors=10, graph=None, render=False, weighted=False):
         self.data = data
         self.top_authors = top_authors
-        self.sender_id, self.sender_info, self.connections = self.__get_data()
-        self.__get_file()
+        # weighted - pagerank с весами ребер (число комментариев пользователя автору)
+        self.weighted = weighted
+        self.graph = graph if graph is not None else get_graph(data)
+        self.sender_id, self.sender_info, self.connections = self.graph.sender_id, self.graph.sender_info, self.graph.connections
+        # картинка графа (и раскладка узлов для нее) строится только по запросу, в фоне - ранжирование ее не ждет
+        self.image = self.__get_file() if render else None
         
-    def __get_data(self):
-        '''
-        sender_id - узлы (id пользователей)
-        sender_info - (словарь с id в качестве ключа и значений в качестве словаря из first_name и last_name)
-        connections - ребра (id-to-id)
-        '''
-        connections = []
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] != None:
-                post_connections = [(post['from']['id'], reply['sender_id']) for reply in post['replies']]
-                connections.extend(post_connections)
-
-        sender_id = list(set(sum(connections, ())))
-
-        sender_info = {}
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] is not None and post['from']['id'] in sender_id:
-                if post['from']['id'] not in sender_info:
-                    sender_info[post['from']['id']] = {
-                        'first_name': post['from']['first_name'],
-                        'last_name': post['from']['last_name']
-                    }
-
-        for post in self.data['vk'][0]['posts']:
-            if 'replies' in post:
-                for reply in post['replies']:
-                    if reply['sender_id'] in sender_id:
-                        if reply['sender_id'] not in sender_info:
-                            sender_info[reply['sender_id']] = {
-                                'first_name': reply['sender_name'],
-                                'last_name': reply['last_name']
-                            }
-
-        return sender_id, sender_info, connections
-
     def page_rank(self):
         '''
         Для получения топа пользователей pagerank {722219350: 0.04746, 732871646: 0.03822 ...}
         '''
-        G = nx.DiGraph()
-        [G.add_node(k, first_name = self.sender_info[k]['first_name'], last_name = self.sender_info[k]['last_name']) for k in self.sender_id]
-        G.add_edges_from(self.connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20) 
         
         # pagerank - https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.link_analysis.pagerank_alg.pagerank.html
-        pr = nx.pagerank(G)
-        sorted_pr = sorted(pr.items(), key=lambda x: x[1], reverse=True)
-
-        top_pr = sorted_pr[:self.top_authors] 
+        pr = self.graph.pagerank(weighted=self.weighted)
+        top_pr = top_items(pr, self.top_authors)
         
         # топ 10 пользователей с наибольшим pagerank
         name_surname_dict = {k: round(v, 5) for k, v in top_pr}
@@ -284,72 +244,31 @@ class PageRank:
     
     def __get_file(self):
         '''
-        Для сохранения файла pagerank
+        Картинка графа pagerank: рисуется в фоне и кешируется по графу (rendering.py), возвращает Future с путем к файлу
         '''
-        # spring_layout - https://networkx.org/documentation/stable/reference/generated/networkx.drawing.layout.spring_layout.html
-        G = nx.DiGraph()
-        [G.add_node(k, first_name=self.sender_info[k]['first_name'], last_name=self.sender_info[k]['last_name']) for k in self.sender_id]
-        G.add_edges_from(self.connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20)
-
-        pr = nx.pagerank(G)
-        sorted_pr = sorted(pr.items(), key=lambda x: x[1], reverse=True)
-        top_pr = sorted_pr[:self.top_authors]
-        top_ids = [id for id, pr in top_pr]
-        top_nodes = {node: G.nodes[node]['first_name'] + ' ' + G.nodes[node]['last_name'] for node in dict(top_pr).keys()}
-
-        node_colors = ['#FF5558' if node in top_ids else "#27BBBD" for node in G.nodes()]
-        # plt.figure(figsize=(10, 10))
-        # nx.draw_networkx_labels(G, pos,
-        #                         labels=top_nodes,
-        #                         font_color='#333335',
-        #                         font_size=10,
-        #                         bbox=dict(facecolor='white', edgecolor='white', boxstyle='square'))
-        # nx.draw(G, pos,
-        #         nodelist=list(pr.keys()),
-        #         node_size=[v * 20000 for v in pr.values()],
-        #         with_labels=False,
-        #         node_color=node_colors,
-        #         edge_color='#27BBBD',
-        #         width=0.2)
-        
-        # current_dir = os.getcwd()
-        # file_path = os.path.join(current_dir, 'data/PageRank.png')
-        # plt.savefig(file_path) 
-        # plt.close()  
+        ranking = 'pagerank weighted' if self.weighted else 'pagerank'
+        values = self.graph.pagerank(weighted=self.weighted)
+        return render_ranking(self.graph, ranking, values, self.top_authors, figsize=(10, 10))
         
     def get_table(self):
         '''
         Данные для таблицы топ-инфлюенсеров
         '''
         result_dict = {}
-        for k, v in self.page_rank().items():
+        page_rank = self.page_rank()
+        for k, v in page_rank.items():
             name = self.sender_info[k]['first_name'] + ' ' + self.sender_info[k]['last_name']
             result_dict[name] = {
-                'page_rank': self.page_rank()[k],
+                'page_rank': page_rank[k],
                 'id': k
             }
 
+        # степени узлов и комментарии пользователя берутся из индексов графа, без обхода всех ребер и постов
         for key, value in result_dict.items():
-            id_to_find = value['id']
-            count = 0
-            for tpl in self.connections:
-                if id_to_find in tpl:
-                    count += 1
-            value['engagement_users'] = count
-        
-        for key, value in result_dict.items():
-            value['comments'] = []  # создаем пустой список для комментариев
-            
-        id = [value['id'] for key, value in result_dict.items()]
-
-        for post in self.data['vk'][0]['posts']:
-            for replies in post['replies']:
-                for key, value in result_dict.items():
-                    if replies['sender_id'] == value['id']:
-                        value['comments'].append(replies['text'])
+            value['engagement_users'] = self.graph.degree(value['id'])
+            value['comments'] = self.graph.index.replies_of(value['id'])
                         
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        annotate_groups(self.data['vk'])
         
         for key, value in result_dict.items():
             pos_count = 0
@@ -357,8 +276,7 @@ class PageRank:
             comments = value['comments']
 
             for comment in comments:
-                sentiment = classifier(comment)
-                if sentiment[0]['label'] == 'POSITIVE':
+                if comment['annotated_sentiment']['label'] == 'POSITIVE':
                     pos_count += 1
                 else:
                     neg_count += 1
@@ -375,8 +293,8 @@ class PageRank:
 
         return result_dict # {'Марина Вкусвилл': {'page_rank': 0.04746,  'id': 722219350,  'engagement_users': 28,  'net_promoter_score': 82.14285714285714},
     
-def top_pagerank_influencers(data):
-    influencers = PageRank(data)    
+def top_pagerank_influencers(data, weighted=False):
+    influencers = PageRank(data, weighted=weighted)    
     return influencers.get_table()
 
 class BetweennessCentralityRank:
@@ -384,135 +302,63 @@ class BetweennessCentralityRank:
     Топ-10 авторов с наибольшей способностью вовлекать других пользователей в дискуссию
     [пользователь | значение page rank]
     '''
-    def __init__(self, data, top_authors=10):
+    def __init__(self, data, top_authors=10, graph=None, render=False, betweenness=None):
         self.data = data
         self.top_authors = top_authors
-        self.sender_id, self.sender_info, self.connections = self.__get_data()
-        self.__get_file()
+        # параметры расчета betweenness, например {'mode': 'approximate', 'pivots': 500} или {'mode': 'approximate', 'epsilon': 0.01}
+        self.betweenness = dict({'top_k': top_authors}, **(betweenness or {}))
+        self.graph = graph if graph is not None else get_graph(data)
+        self.sender_id, self.sender_info, self.connections = self.graph.sender_id, self.graph.sender_info, self.graph.connections
+        # картинка графа (и раскладка узлов для нее) строится только по запросу, в фоне - ранжирование ее не ждет
+        self.image = self.__get_file() if render else None
         
-    def __get_data(self):
-        '''
-        sender_id - узлы (id пользователей)
-        sender_info - (словарь с id в качестве ключа и значений в качестве словаря из first_name и last_name)
-        connections - ребра (id-to-id)
-        '''
-        connections = []
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] != None:
-                post_connections = [(post['from']['id'], reply['sender_id']) for reply in post['replies']]
-                connections.extend(post_connections)
-
-        sender_id = list(set(sum(connections, ())))
-
-        sender_info = {}
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] is not None and post['from']['id'] in sender_id:
-                if post['from']['id'] not in sender_info:
-                    sender_info[post['from']['id']] = {
-                        'first_name': post['from']['first_name'],
-                        'last_name': post['from']['last_name']
-                    }
-
-        for post in self.data['vk'][0]['posts']:
-            if 'replies' in post:
-                for reply in post['replies']:
-                    if reply['sender_id'] in sender_id:
-                        if reply['sender_id'] not in sender_info:
-                            sender_info[reply['sender_id']] = {
-                                'first_name': reply['sender_name'],
-                                'last_name': reply['last_name']
-                            }
-
-        return sender_id, sender_info, connections
-
     def page_rank(self):
         '''
         Для получения топа пользователей betweenness_centrality_rank {722219350: 0.04746, 732871646: 0.03822 ...}
         '''
-        G = nx.DiGraph()
-        [G.add_node(k, first_name = self.sender_info[k]['first_name'], last_name = self.sender_info[k]['last_name']) for k in self.sender_id]
-        G.add_edges_from(self.connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20) 
         
         # pagerank - https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.link_analysis.pagerank_alg.pagerank.html
-        centrality = nx.betweenness_centrality(G)
-        sorted_centrality = sorted(centrality.items(), key=lambda x: x[1], reverse=True)
-
-        top_centrality = sorted_centrality[:self.top_authors] 
+        centrality = self.graph.betweenness_centrality(**self.betweenness)
+        top_centrality = top_items(centrality, self.top_authors)
         
         # топ 10 пользователей с наибольшим pagerank
         name_surname_dict = {k: round(v, 5) for k, v in top_centrality}
         
         return name_surname_dict # возвращает id и значение pagerank {722219350: 0.04746, 732871646: 0.03822 ...}    
     
-    def __get_file(self):
+    def info(self):
         '''
-        Для сохранения файла pagerank
+        Параметры расчета betweenness: режим, число опорных вершин и узлов {'mode': 'exact', 'pivots': 120, 'nodes': 120}
         '''
-        # spring_layout - https://networkx.org/documentation/stable/reference/generated/networkx.drawing.layout.spring_layout.html
-        G = nx.DiGraph()
-        [G.add_node(k, first_name=self.sender_info[k]['first_name'], last_name=self.sender_info[k]['last_name']) for k in self.sender_id]
-        G.add_edges_from(self.connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20)
+        return self.graph.betweenness(**self.betweenness)[1]
 
-        centrality = nx.betweenness_centrality(G)
-        sorted_centrality = sorted(centrality.items(), key=lambda x: x[1], reverse=True)
-        top_centrality = sorted_centrality[:self.top_authors] 
-        top_ids = [id for id, pr in top_centrality]
-        top_nodes = {node: G.nodes[node]['first_name'] + ' ' + G.nodes[node]['last_name'] for node in dict(top_centrality).keys()}
-
-        node_colors = ['#FF5558' if node in top_ids else '#27BBBD' for node in G.nodes()]
-        # plt.figure(figsize=(15, 15))
-        # nx.draw_networkx_labels(G, pos,
-        #                         labels=top_nodes,
-        #                         font_color='#333335',
-        #                         font_size=10,
-        #                         bbox=dict(facecolor='white', edgecolor='white', boxstyle='square'))
-        # nx.draw(G, pos,
-        #         nodelist=list(centrality.keys()),
-        #         node_size=[v * 20000 for v in centrality.values()],
-        #         with_labels=False,
-        #         node_color=node_colors,
-        #         edge_color='#27BBBD',
-        #         width=0.2)
-        
-        # current_dir = os.getcwd()
-        # file_path = os.path.join(current_dir, 'data/BetweennessCentralityRank.png')
-        # plt.savefig(file_path) 
-        # plt.close()      
+    def __get_file(self):
+        '''
+        Картинка графа betweenness centrality: рисуется в фоне и кешируется по графу (rendering.py), возвращает Future с путем к файлу
+        '''
+        ranking = 'betweenness ' + json.dumps(self.betweenness, sort_keys=True)
+        values = self.graph.betweenness_centrality(**self.betweenness)
+        return render_ranking(self.graph, ranking, values, self.top_authors, figsize=(15, 15))
     
     def get_table(self):
         '''
         Данные для таблицы топ-инфлюенсеров BetweennessCentralityRank
         '''
         result_dict = {}
-        for k, v in self.page_rank().items():
+        centrality = self.page_rank()
+        for k, v in centrality.items():
             name = self.sender_info[k]['first_name'] + ' ' + self.sender_info[k]['last_name']
             result_dict[name] = {
-                'bc_rank': self.page_rank()[k],
+                'bc_rank': centrality[k],
                 'id': k
             }
 
+        # степени узлов и комментарии пользователя берутся из индексов графа, без обхода всех ребер и постов
         for key, value in result_dict.items():
-            id_to_find = value['id']
-            count = 0
-            for tpl in self.connections:
-                if id_to_find in tpl:
-                    count += 1
-            value['engagement_users'] = count
-        
-        for key, value in result_dict.items():
-            value['comments'] = []  
-
-        for post in self.data['vk'][0]['posts']:
-            for replies in post['replies']:
-                for key, value in result_dict.items():
-                    if replies['sender_id'] == value['id']:
-                        value['comments'].append(replies['text'])
+            value['engagement_users'] = self.graph.degree(value['id'])
+            value['comments'] = self.graph.index.replies_of(value['id'])
                         
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        annotate_groups(self.data['vk'])
         
         for key, value in result_dict.items():
             comments = value['comments']
@@ -522,8 +368,7 @@ class BetweennessCentralityRank:
             neu_count = 0
 
             for comment in comments:
-                sentiment = classifier(comment)
-                label = sentiment[0]['label']
+                label = comment['annotated_sentiment']['label']
 
                 if label == 'POSITIVE':
                     pos_count += 1
@@ -543,6 +388,6 @@ class BetweennessCentralityRank:
         
         return result_dict # {'Татьяна Балакирева': {'bc_rank': 0.07433, 'id': 588079193,  'engagement_users': 81,  'positive': 73.33333333333333,  'negative': 8.88888888888889,  'neutral': 17.77777777777778},
     
-def top_bcr_rank_influencers(data):
-    influencers = BetweennessCentralityRank(data)    
+def top_bcr_rank_influencers(data, betweenness=None):
+    influencers = BetweennessCentralityRank(data, betweenness=betweenness)    
     return influencers.get_table()
\ No newline at end of file
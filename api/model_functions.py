@@ -1,6 +1,7 @@
-from collections import defaultdict
-from transformers import pipeline
-import networkx as nx
+from annotation import annotate_groups
+from graph import get_graph
+from columns import get_columns
+from topk import top_k, top_items
 
 
 class Model:
@@ -11,13 +12,9 @@ class Model:
         '''
         Доля подписчиков сообщества среди активных пользователей
         '''
-        active_users = 0
-        followers = 0
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] != None:
-                active_users += 1
-                followers += post['from']['is_member']
+        columns = get_columns(self.data['vk'][0])
+        active_users = int(columns.has_author.sum())
+        followers = int(columns.author_is_member.sum())
                 
         if active_users != 0:
             return followers / active_users
@@ -28,27 +25,19 @@ class Model:
         '''
         Доля комментирующих среди активных пользователей
         '''
-        post_data = defaultdict(int)
-        post_count = len(self.data['vk'][0]['posts'])
-
-        ratios = []
-        for post in self.data['vk'][0]['posts']:
-            sender_ids = set(comment['sender_id'] for comment in post['replies'])
-
-            unique_sender_count = len(sender_ids)
-            unique_forward_count = post['forwards']
-            unique_reaction_count = post['reactions'][0]['count']
+        import numpy as np
 
-            post_data[post['id']] = {
-                'unique_sender_count': unique_sender_count,
-                'unique_forward_count': unique_forward_count,
-                'unique_reaction_count': unique_reaction_count
-            }
+        columns = get_columns(self.data['vk'][0])
+        post_count = len(columns)
 
-            ratios.append(unique_sender_count / (unique_sender_count + unique_forward_count + unique_reaction_count))
+        # по каждому посту: уникальные комментаторы / (уникальные комментаторы + репосты + первая реакция)
+        # пост без комментариев, репостов и реакций дает 0, а не 0 / 0
+        unique_sender_count = columns.unique_senders_per_post()
+        total = unique_sender_count + columns.forwards + columns.first_reaction()
+        ratios = np.divide(unique_sender_count, total, out=np.zeros(len(total)), where=total != 0)
 
         if post_count != 0:
-            return sum(ratios) / post_count
+            return float(ratios.sum()) / post_count
         else:
             return 0
     
@@ -56,17 +45,17 @@ class Model:
         '''
         Доля подписчиков из топа активных пользователей
         '''
-        active_users = 0
-        followers = 0
+        import numpy as np
 
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] != None:
-                sorted_posts = sorted(self.data['vk'][0]['posts'], key=lambda x: (x['views'] if x['views'] is not None else len(x['replies'])) if x['from'] is not None else -1, reverse=True)
-                top_posts = sorted_posts[:10]
+        # топ-10 постов по просмотрам (без просмотров - по числу комментариев, без автора - в конце)
+        columns = get_columns(self.data['vk'][0])
+        key = np.where(columns.has_views, columns.views, columns.reply_count())
+        key[~columns.has_author] = -1
+        top_posts = np.argsort(-key, kind='stable')[:10]
+        top_posts = top_posts[columns.has_author[top_posts]]
 
-        for post in top_posts:
-            active_users += 1
-            followers += post['from']['is_member']
+        active_users = len(top_posts)
+        followers = int(columns.author_is_member[top_posts].sum())
                 
         if active_users != 0:
             return followers / active_users
@@ -77,18 +66,12 @@ class Model:
         '''
         Коэффициент привлекательности
         '''
-        love_rate_sum = 0
-        post_count = 0
+        columns = get_columns(self.data['vk'][0])
+        views = columns.views[columns.has_views]
+        likes = columns.first_reaction()[columns.has_views]
 
-        for post in self.data['vk'][0]['posts']:
-            if post['views'] is not None:
-                views = post['views']
-                likes = post['reactions'][0]['count']
-                
-                love_rate = likes / views
-                
-                love_rate_sum += love_rate
-                post_count += 1
+        love_rate_sum = float((likes / views).sum())
+        post_count = len(views)
 
         if post_count != 0:
             return (love_rate_sum / post_count) / 0.05
@@ -108,10 +91,9 @@ class Model:
             if replies:
                 posts_with_replies.append({'post_id': post_id, 'replies_count': len(replies), 'replies': replies})
                 
-        sorted_posts = sorted(posts_with_replies, key=lambda x: x['replies_count'], reverse=True)
-        top_posts = sorted_posts[:10]
+        top_posts = top_k(posts_with_replies, 10, key=lambda x: x['replies_count'])
         
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        annotate_groups(self.data['vk'])
         post_sentiments = {}
 
         for post in top_posts:
@@ -122,8 +104,7 @@ class Model:
             negative_count = 0
             
             for reply in replies:
-                text = reply['text']
-                tone = classifier(text)[0]['label']
+                tone = reply['annotated_sentiment']['label']
                 
                 if tone == 'POSITIVE':
                     positive_count += 1
@@ -149,7 +130,7 @@ class Model:
         '''
         Лояльность аудитории бренда
         '''
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        annotate_groups(self.data['vk'])
         post_sentiments = {}
 
         for post in self.data['vk'][0]['posts']:
@@ -161,8 +142,7 @@ class Model:
                 negative_count = 0
                 
                 for reply in replies:
-                    text = reply['text']
-                    tone = classifier(text)[0]['label'] 
+                    tone = reply['annotated_sentiment']['label']
                     
                     if tone == 'POSITIVE':
                         positive_count += 1
@@ -214,15 +194,14 @@ class Model:
         count_1 = 0
         count_0 = 0
 
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        brand_name = self.data['vk'][0]['groupName'].lower()
+        annotate_groups(self.data['vk'])
 
         for post in self.data['vk'][0]['posts']:
             text = post['text'].lower()
-            brand_name = self.data['vk'][0]['groupName'].lower()
             
             if brand_name in text:
-                result = classifier(text)
-                tone = result[0]['label']
+                tone = post['annotated_sentiment']['label']
 
                 if tone == 'NEGATIVE':
                     for reply in post['replies']:
@@ -266,41 +245,25 @@ class Model:
         '''
         Доля лояльных инфлюенсеров из топа
         '''
-        connections = []
-
-        for post in self.data['vk'][0]['posts']:
-            if post['from'] != None:
-                post_connections = [(post['from']['id'], reply['sender_id']) for reply in post['replies']]
-                connections.extend(post_connections)
-
-        G = nx.DiGraph()
-        G.add_edges_from(connections)
-        pos = nx.spring_layout(G, k=0.15, iterations=20) 
-
-        # pagerank - https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.link_analysis.pagerank_alg.pagerank.html
-        pr = nx.pagerank(G)
-        sorted_pr = sorted(pr.items(), key=lambda x: x[1], reverse=True)
+        graph = get_graph(self.data)
 
-        top_10_pr = sorted_pr[:10] 
+        pr = graph.pagerank()
+        top_10_pr = top_items(pr, 10)
         top_10_ids_pr = [id for id, pr in top_10_pr]
 
-        # https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.centrality.betweenness_centrality.html
-        centrality = nx.betweenness_centrality(G)
-        sorted_centrality = sorted(centrality.items(), key=lambda x: x[1], reverse=True)
-
-        top_10_centrality = sorted_centrality[:10] 
+        centrality = graph.betweenness_centrality()
+        top_10_centrality = top_items(centrality, 10)
         top_10_ids_centrality = [id for id, _ in top_10_centrality]
 
         top_users = list(set(top_10_ids_pr + top_10_ids_centrality))
 
-        classifier = pipeline("sentiment-analysis", model="blanchefort/rubert-base-cased-sentiment")
+        annotate_groups(self.data['vk'])
 
         user_sentiments = {}
 
         for post in self.data['vk'][0]['posts']:
             if post['from'] is not None and post['from']['id'] in top_users:
-                text = post['text']
-                result = classifier(text)[0]
+                result = post['annotated_sentiment']
 
                 user_id = post['from']['id']
                 if user_id not in user_sentiments:
@@ -313,8 +276,7 @@ class Model:
 
             for reply in post['replies']:
                 if reply['sender_id'] in top_users:
-                    text = reply['text']
-                    result = classifier(text)[0]
+                    result = reply['annotated_sentiment']
 
                     user_id = reply['sender_id']
                     if user_id not in user_sentiments:
@@ -343,18 +305,12 @@ class Model:
         '''
         Индекс цитируемости
         '''
-        channel_citation_sum = 0
-        post_count = 0
+        columns = get_columns(self.data['vk'][0])
+        views = columns.views[columns.has_views]
+        forwards = columns.forwards[columns.has_views]
 
-        for post in self.data['vk'][0]['posts']:
-            if post['views'] is not None:
-                views = post['views']
-                forwards = post['forwards']
-                
-                channel_citation_index = forwards / views
-                
-                channel_citation_sum += channel_citation_index
-                post_count += 1
+        channel_citation_sum = float((forwards / views).sum())
+        post_count = len(views)
 
         if post_count != 0:
             return (channel_citation_sum / post_count) / 0.05
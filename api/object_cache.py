@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+
+class ObjectCache:
+    '''
+    Производные объекты (граф кейса, колонки сообщества), привязанные к объекту-источнику без записи в его поля:
+    источник остается сериализуемым в JSON
+    Если у источника есть атрибут attribute (кейсы и сообщества, прочитанные crawl_stream/crawl_codec), объект хранится
+    в нем и живет, пока жив источник. Иначе (обычный словарь) - в самом кеше: ключ - id источника, запись держит ссылку
+    на источник, поэтому id не может достаться другому объекту, пока запись в кеше; не больше max_size записей,
+    вытесняются давно не использованные (LRU)
+    '''
+    def __init__(self, max_size, attribute=None):
+        self.max_size = max_size
+        self.attribute = attribute
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__building = {}
+
+    def get(self, source, build):
+        '''
+        Объект для source из кеша или build(source) с сохранением в кеш; одновременные запросы одного источника строят его один раз
+        '''
+        key = id(source)
+        with self.__lock:
+            value = self.__lookup(key, source)
+            if value is not None:
+                return value
+            lock = self.__building.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                with self.__lock:
+                    value = self.__lookup(key, source)
+                if value is None:
+                    value = build(source)
+                    self.__put(key, source, value)
+                return value
+        finally:
+            with self.__lock:
+                self.__building.pop(key, None)
+
+    def __lookup(self, key, source):
+        if self.__attached(source):
+            return getattr(source, self.attribute)
+        entry = self.__entries.get(key)
+        if entry is None or entry[0] is not source:
+            return None
+        self.__entries.move_to_end(key)
+        return entry[1]
+
+    def __put(self, key, source, value):
+        if self.__attached(source):
+            setattr(source, self.attribute, value)
+            return
+        with self.__lock:
+            if self.max_size <= 0:
+                return
+            self.__entries[key] = (source, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def __attached(self, source):
+        return self.attribute is not None and hasattr(source, self.attribute)
+
+    def __len__(self):
+        return len(self.__entries)
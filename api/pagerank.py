@@ -0,0 +1,154 @@
+ALPHA = 0.85
+TOL = 1.0e-6
+MAX_ITER = 100
+
+
+def index_edges(nodes, edges):
+    '''
+    Перевод id пользователей в плотные целые индексы: (index, sources, targets)
+    '''
+    import numpy as np
+
+    index = {node: i for i, node in enumerate(nodes)}
+    sources = np.fromiter((index[u] for u, v in edges), dtype=np.int64, count=len(edges))
+    targets = np.fromiter((index[v] for u, v in edges), dtype=np.int64, count=len(edges))
+    return index, sources, targets
+
+
+def row_normalize(A):
+    '''
+    Нормировка строк CSR матрицы на сумму и маска висячих узлов (нулевых строк)
+    '''
+    import numpy as np
+    import scipy.sparse as sp
+
+    n = A.shape[0]
+    out_degree = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_degree == 0
+    scale = np.zeros(n)
+    scale[~dangling] = 1.0 / out_degree[~dangling]
+    return sp.diags(scale) @ A, dangling
+
+
+def power_iteration(A, dangling, x=None, p=None, alpha=ALPHA, tol=TOL, max_iter=MAX_ITER):
+    '''
+    Степенной метод (как nx.pagerank): вероятность висячих узлов распределяется равномерно
+    x - начальное приближение, p - вектор телепортации (по умолчанию оба равномерные)
+    Возвращает (вектор pagerank, число итераций)
+    '''
+    import numpy as np
+
+    if p is None:
+        p = np.full(A.shape[0], 1.0 / A.shape[0])
+    n = np.count_nonzero(p)
+    x = p.copy() if x is None or not x.sum() else x / x.sum()
+    A_T = A.T.tocsr()
+
+    for iteration in range(1, max_iter + 1):
+        x_last = x
+        x = alpha * (A_T @ x_last + x_last[dangling].sum() * p) + (1 - alpha) * p
+        if np.abs(x - x_last).sum() < n * tol:
+            return x, iteration
+
+    raise RuntimeError('pagerank: power iteration failed to converge in %d iterations' % max_iter)
+
+
+def apply_delta(edges, added=(), removed=()):
+    '''
+    Ребра после изменения: removed удаляются (все повторы), added добавляются в конец
+    '''
+    removed = set(removed)
+    return [edge for edge in edges if edge not in removed] + list(added)
+
+
+class IncrementalPageRank:
+    '''
+    PageRank, который обновляется при повторном краулинге без перестроения графа
+    Хранит индекс узлов, матрицу числа ребер и последний вектор; update() меняет только затронутые ребра
+    и запускает степенной метод с прошлого вектора (результат совпадает с полным расчетом с точностью до tol)
+    '''
+    def __init__(self, nodes, edges, previous=None, alpha=ALPHA, tol=TOL, max_iter=MAX_ITER, indexed=None):
+        '''
+        previous - {id: pagerank} прошлого краулинга этого же сообщества для теплого старта
+        indexed - готовые массивы (sources, targets) с номерами узлов в nodes, чтобы не переводить edges заново
+        '''
+        import numpy as np
+        import scipy.sparse as sp
+
+        self.alpha, self.tol, self.max_iter = alpha, tol, max_iter
+        self.nodes = list(nodes)
+        if indexed is None:
+            self.index, sources, targets = index_edges(self.nodes, edges)
+        else:
+            self.index = {node: i for i, node in enumerate(self.nodes)}
+            sources, targets = indexed
+        n = len(self.nodes)
+        self.counts = sp.csr_matrix(([1.0] * len(sources), (sources, targets)), shape=(n, n))
+        self.counts.sum_duplicates()
+        self.x = None
+        if previous:
+            self.x = np.fromiter((previous.get(node, 0.0) for node in self.nodes), dtype=float, count=n)
+        self.iterations = 0
+
+    def __grow(self, edges):
+        for edge in edges:
+            for node in edge:
+                if node not in self.index:
+                    self.index[node] = len(self.nodes)
+                    self.nodes.append(node)
+        n = len(self.nodes)
+        if self.counts.shape[0] != n:
+            self.counts.resize((n, n))
+            if self.x is not None:
+                self.x.resize(n, refcheck=False)
+
+    def update(self, added=(), removed=(), weighted=False):
+        '''
+        added/removed - ребра (id-to-id); removed удаляет все повторы ребра
+        '''
+        self.apply(added, removed)
+        return self.ranks(weighted)
+
+    def apply(self, added=(), removed=()):
+        '''
+        Изменение матрицы числа ребер без пересчета pagerank
+        '''
+        import numpy as np
+        import scipy.sparse as sp
+
+        added, removed = list(added), list(set(removed))
+        self.__grow(added)
+        removed = [(u, v) for u, v in removed if u in self.index and v in self.index]
+        n = len(self.nodes)
+
+        rows = [self.index[u] for u, v in added] + [self.index[u] for u, v in removed]
+        cols = [self.index[v] for u, v in added] + [self.index[v] for u, v in removed]
+        current = np.asarray(self.counts[rows[len(added):], cols[len(added):]]).ravel() if removed else []
+        values = [1.0] * len(added) + [-c for c in current]
+        delta = sp.csr_matrix((values, (rows, cols)), shape=(n, n))
+        self.counts = self.counts + delta
+        self.counts.eliminate_zeros()
+
+    def ranks(self, weighted=False):
+        '''
+        {id: pagerank} узлов, у которых есть хотя бы одно ребро
+        weighted - переходы пропорциональны числу повторных ребер (комментариев автору), иначе повторы склеиваются
+        '''
+        import numpy as np
+
+        # узлы без ребер (все их ребра удалены) исключаются, как при построении графа заново
+        active = (np.diff(self.counts.indptr) > 0) | (np.bincount(self.counts.indices, minlength=len(self.nodes)) > 0)
+        if not active.any():
+            return {}
+
+        if weighted:
+            A, dangling = row_normalize(self.counts)
+        else:
+            # повторные ребра склеиваются в одно, как в nx.DiGraph
+            binary = self.counts.copy()
+            binary.data[:] = 1.0
+            A, dangling = row_normalize(binary)
+        p = active / active.sum()
+        x = p if self.x is None else self.x * active
+        self.x, self.iterations = power_iteration(A, dangling & active, x, p, self.alpha, self.tol, self.max_iter)
+        return {node: rank for node, rank, is_active in zip(self.nodes, self.x.tolist(), active) if is_active}
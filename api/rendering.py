@@ -0,0 +1,123 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from graph_layout import cached_layout, neighbourhood
+from topk import top_items
+
+RENDER_DIR = os.environ.get('GRAPH_RENDER_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'sna', 'graphs'))
+RENDER_WORKERS = int(os.environ.get('GRAPH_RENDER_WORKERS', 1))
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+def render_key(edge_hash, ranking, top_k, labels=()):
+    '''
+    Ключ картинки - хеш множества ребер графа, тип ранжирования (с параметрами), число выделенных узлов
+    и подписи выделенных узлов (имена пользователей могут измениться при тех же ребрах)
+    '''
+    return hashlib.sha1(('%s:%s:%d:%r' % (edge_hash, ranking, top_k, list(labels))).encode('utf-8')).hexdigest()
+
+
+def image_path(key, directory=RENDER_DIR):
+    return os.path.join(directory, key + '.png')
+
+
+def submit(key, draw, directory=RENDER_DIR):
+    '''
+    Фоновая отрисовка картинки в directory/<key>.png, draw(path) рисует картинку в файл path
+    Возвращает Future с путем к файлу: готовая картинка и уже запущенная отрисовка того же ключа переиспользуются
+    '''
+    global _executor
+    path = image_path(key, directory)
+
+    with _lock:
+        if key in _jobs:
+            return _jobs[key]
+        if os.path.exists(path):
+            future = Future()
+            future.set_result(path)
+            return future
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix='render')
+        future = _jobs[key] = _executor.submit(_render, draw, path)
+
+    # после завершения картинка берется с диска, после ошибки - рисуется заново при следующем запросе
+    future.add_done_callback(lambda _: _forget(key))
+    return future
+
+
+def _forget(key):
+    with _lock:
+        _jobs.pop(key, None)
+
+
+def _render(draw, path):
+    '''
+    Рисует во временный файл и атомарно переименовывает, чтобы параллельные запросы не видели недописанную картинку
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, threading.get_ident())
+    try:
+        draw(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def draw_ranking(G, pos, values, top_authors, figsize, path):
+    '''
+    Граф с размером узлов по значению метрики и подписями топ-авторов (pagerank, betweenness centrality)
+    '''
+    # объектный API matplotlib без pyplot - отрисовка безопасна вне главного потока
+    import networkx as nx
+    from matplotlib.figure import Figure
+
+    top = top_items(values, top_authors)
+    top_ids = set(node for node, value in top)
+    top_nodes = {node: G.nodes[node]['first_name'] + ' ' + G.nodes[node]['last_name'] for node in top_ids}
+    node_colors = ['#FF5558' if node in top_ids else '#27BBBD' for node in G.nodes()]
+
+    figure = Figure(figsize=figsize)
+    ax = figure.subplots()
+    nx.draw_networkx_labels(G, pos,
+                            labels=top_nodes,
+                            font_color='#333335',
+                            font_size=10,
+                            bbox=dict(facecolor='white', edgecolor='white', boxstyle='square'),
+                            ax=ax)
+    nx.draw(G, pos,
+            nodelist=list(values.keys()),
+            node_size=[v * 20000 for v in values.values()],
+            with_labels=False,
+            node_color=node_colors,
+            edge_color='#27BBBD',
+            width=0.2,
+            ax=ax)
+    figure.savefig(path, format='png')
+
+
+def render_ranking(graph, ranking, values, top_authors, figsize=(10, 10), directory=RENDER_DIR):
+    '''
+    Картинка ранжирования в фоне: ranking - тип ранжирования с параметрами ('pagerank', 'betweenness ...'),
+    values - {id: значение}, посчитанные вызывающим (фоновый поток не обращается к метрикам графа)
+    Возвращает Future с путем к картинке
+    '''
+    labels = [(node, graph.sender_info[node]['first_name'] + ' ' + graph.sender_info[node]['last_name'])
+              for node, value in top_items(values, top_authors)]
+    key = render_key(graph.edge_hash(), ranking, top_authors, labels)
+    return submit(key, lambda path: _draw(graph, values, top_authors, figsize, directory, path), directory)
+
+
+def _draw(graph, values, top_authors, figsize, directory, path):
+    '''
+    Большой граф рисуется по подграфу из топ-авторов и их соседей, координаты узлов кешируются на диске
+    '''
+    nodes = neighbourhood(graph.G, values, top_authors)
+    pos = cached_layout(graph, nodes, directory)
+    G = graph.G if len(nodes) == len(graph.G) else graph.G.subgraph(nodes)
+    draw_ranking(G, pos, {node: values[node] for node in G}, top_authors, figsize, path)
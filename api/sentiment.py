@@ -0,0 +1,107 @@
+import os
+import threading
+from sentiment_cache import get_cache
+
+# https://huggingface.co/blanchefort/rubert-base-cased-sentiment модель для анализа тональности
+MODEL_NAME = "blanchefort/rubert-base-cased-sentiment"
+BATCH_SIZE = int(os.environ.get('SENTIMENT_BATCH_SIZE', 32))
+# torch - pipeline из transformers, onnx - квантованная в int8 модель на onnxruntime (sentiment_onnx.py)
+BACKEND = os.environ.get('SENTIMENT_BACKEND', 'torch')
+# сколько токенов (с учетом паддинга) допускается в одном батче
+TOKEN_BUDGET = int(os.environ.get('SENTIMENT_TOKEN_BUDGET', 8192))
+MAX_LENGTH = 512
+
+# тексты для прогрева модели при старте сервера
+WARMUP_TEXTS = ['Спасибо, очень вкусно!', 'Ужасное качество, больше не куплю', 'Обычный день', '👍']
+
+_classifiers = {}
+_lock = threading.Lock()
+
+
+def get_classifier(model=MODEL_NAME, backend=BACKEND):
+    '''
+    Общий на весь процесс классификатор тональности
+    Модель загружается один раз при первом обращении, дальше переиспользуется всеми запросами
+    '''
+    classifier = _classifiers.get((model, backend))
+    if classifier is None:
+        with _lock:
+            classifier = _classifiers.get((model, backend))
+            if classifier is None:
+                if backend == 'onnx':
+                    from sentiment_onnx import OnnxSentimentClassifier
+                    classifier = OnnxSentimentClassifier(model)
+                elif backend == 'torch':
+                    from transformers import pipeline
+                    classifier = pipeline("sentiment-analysis", model=model)
+                else:
+                    raise ValueError('Unknown sentiment backend: %s' % backend)
+                _classifiers[(model, backend)] = classifier
+    return classifier
+
+
+def warmup(model=MODEL_NAME, backend=BACKEND):
+    '''
+    Загрузка модели и прогон пробного батча в обход кеша,
+    чтобы первый запрос не платил за загрузку весов и инициализацию
+    '''
+    classifier = get_classifier(model, backend)
+    classifier(WARMUP_TEXTS, batch_size=len(WARMUP_TEXTS), truncation=True)
+
+
+def token_batches(texts, lengths, token_budget=TOKEN_BUDGET, batch_size=BATCH_SIZE):
+    '''
+    Разбиение текстов на батчи по бюджету токенов
+    Тексты близкой длины попадают в один батч, длинные тексты идут батчами меньшего размера
+    lengths - длины текстов в токенах
+    '''
+    batch = []
+    longest = 0
+
+    for length, text in sorted(zip(lengths, texts), key=lambda x: x[0]):
+        length = min(length, MAX_LENGTH)
+        if batch and (len(batch) >= batch_size or max(longest, length) * (len(batch) + 1) > token_budget):
+            yield batch
+            batch = []
+            longest = 0
+
+        batch.append(text)
+        longest = max(longest, length)
+
+    if batch:
+        yield batch
+
+
+def annotate(texts, batch_size=BATCH_SIZE, model=MODEL_NAME, backend=BACKEND, token_budget=TOKEN_BUDGET):
+    '''
+    Разметка тональности для всех текстов запроса за один проход
+    Дубликаты убираются, уже размеченные тексты берутся из дискового кеша,
+    остальные группируются по длине в токенах и отправляются в модель батчами (token_batches)
+    Возвращает словарь {текст: {'label': 'POSITIVE', 'score': 0.97}}
+    '''
+    unique_texts = {text for text in texts if text is not None}
+    if not unique_texts:
+        return {}
+
+    # метки квантованной модели могут отличаться, поэтому в кеше они хранятся отдельно
+    cache_model = model if backend == 'torch' else model + '@' + backend
+    cache = get_cache()
+    sentiments = cache.get_many(unique_texts, cache_model) if cache is not None else {}
+
+    missing = [text for text in unique_texts if text not in sentiments]
+    if not missing:
+        return sentiments
+
+    classifier = get_classifier(model, backend)
+    lengths = [len(ids) for ids in classifier.tokenizer(missing, truncation=True, max_length=MAX_LENGTH)['input_ids']]
+    classified = {}
+
+    for batch in token_batches(missing, lengths, token_budget, batch_size):
+        results = classifier(batch, batch_size=len(batch), truncation=True)
+        classified.update(zip(batch, results))
+
+    if cache is not None:
+        cache.put_many(classified, cache_model)
+
+    sentiments.update(classified)
+    return sentiments
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+CACHE_DIR = os.environ.get('SENTIMENT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'sna'))
+CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE', 1000000))
+
+# ограничение SQLite на число параметров в одном запросе
+_CHUNK = 500
+
+
+def normalize(text):
+    '''
+    Нормализация текста перед хешированием (юникод NFC, без пробелов по краям)
+    '''
+    return unicodedata.normalize('NFC', text).strip()
+
+
+def cache_key(text, model):
+    '''
+    Ключ кеша - хеш от нормализованного текста и названия модели
+    '''
+    return hashlib.sha1((model + '\0' + normalize(text)).encode('utf-8')).hexdigest()
+
+
+class SentimentCache:
+    '''
+    Дисковый кеш разметки тональности (SQLite) с вытеснением давно не используемых записей
+    '''
+    def __init__(self, directory=CACHE_DIR, max_size=CACHE_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'sentiment.sqlite3')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('''CREATE TABLE IF NOT EXISTS sentiments (
+            key TEXT PRIMARY KEY, label TEXT NOT NULL, score REAL NOT NULL, last_used REAL NOT NULL)''')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS sentiments_last_used ON sentiments (last_used)')
+        self.__connection.commit()
+        self.__size = self.__connection.execute('SELECT COUNT(*) FROM sentiments').fetchone()[0]
+
+    def get_many(self, texts, model):
+        '''
+        Поиск готовой разметки {текст: {'label': ..., 'score': ...}} для найденных в кеше текстов
+        '''
+        keys = {}
+        for text in texts:
+            keys.setdefault(cache_key(text, model), []).append(text)
+        found = {}
+        used = []
+
+        with self.__lock:
+            key_list = list(keys)
+            for start in range(0, len(key_list), _CHUNK):
+                chunk = key_list[start:start + _CHUNK]
+                rows = self.__connection.execute(
+                    'SELECT key, label, score FROM sentiments WHERE key IN (%s)' % ','.join('?' * len(chunk)), chunk)
+                for key, label, score in rows:
+                    used.append(key)
+                    for text in keys[key]:
+                        found[text] = {'label': label, 'score': score}
+
+            if used:
+                now = time.time()
+                self.__connection.executemany('UPDATE sentiments SET last_used = ? WHERE key = ?', [(now, key) for key in used])
+                self.__connection.commit()
+
+            self.hits += len(used)
+            self.misses += len(keys) - len(used)
+
+        return found
+
+    def put_many(self, sentiments, model):
+        '''
+        Сохранение разметки {текст: {'label': ..., 'score': ...}}
+        '''
+        if not sentiments:
+            return
+
+        now = time.time()
+        rows = {cache_key(text, model): (result['label'], float(result['score'])) for text, result in sentiments.items()}
+
+        with self.__lock:
+            before = self.__connection.total_changes
+            self.__connection.executemany('INSERT OR IGNORE INTO sentiments (key, label, score, last_used) VALUES (?, ?, ?, ?)',
+                                          [(key, label, score, now) for key, (label, score) in rows.items()])
+            self.__size += self.__connection.total_changes - before
+
+            if self.__size > self.max_size:
+                self.__connection.execute('DELETE FROM sentiments WHERE key IN (SELECT key FROM sentiments ORDER BY last_used LIMIT ?)',
+                                          (self.__size - self.max_size,))
+                self.__size = self.__connection.execute('SELECT COUNT(*) FROM sentiments').fetchone()[0]
+            self.__connection.commit()
+
+    def stats(self):
+        '''
+        Счетчики попаданий и промахов
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'size': self.__size}
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_cache():
+    '''
+    Общий на весь процесс кеш тональности (SENTIMENT_CACHE_SIZE=0 отключает кеш)
+    '''
+    global _cache
+    if CACHE_SIZE <= 0:
+        return None
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = SentimentCache()
+    return _cache
@@ -0,0 +1,106 @@
+import json
+import os
+import numpy as np
+from sentiment import MODEL_NAME, BATCH_SIZE, MAX_LENGTH, get_classifier
+from sentiment_cache import CACHE_DIR
+
+ONNX_DIR = os.environ.get('SENTIMENT_ONNX_DIR', os.path.join(CACHE_DIR, 'onnx'))
+INPUT_NAMES = ['input_ids', 'attention_mask', 'token_type_ids']
+
+
+def export(model=MODEL_NAME, directory=ONNX_DIR):
+    '''
+    Экспорт модели в ONNX с динамическим квантованием весов в int8
+    Возвращает путь к квантованной модели (экспорт выполняется один раз)
+    '''
+    quantized_path = os.path.join(directory, model.replace('/', '--') + '.int8.onnx')
+    if os.path.exists(quantized_path):
+        return quantized_path
+
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    os.makedirs(directory, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    network = AutoModelForSequenceClassification.from_pretrained(model).eval()
+    sample = tokenizer(['Пример комментария'], return_tensors='pt')
+
+    fp32_path = quantized_path.replace('.int8.onnx', '.onnx')
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in INPUT_NAMES}
+    dynamic_axes['logits'] = {0: 'batch'}
+
+    with torch.no_grad():
+        torch.onnx.export(network, tuple(sample[name] for name in INPUT_NAMES), fp32_path,
+                          input_names=INPUT_NAMES, output_names=['logits'], dynamic_axes=dynamic_axes, opset_version=14)
+
+    # пишем во временный файл, чтобы параллельные воркеры не прочитали недописанную модель
+    tmp_path = quantized_path + '.%d.tmp' % os.getpid()
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, quantized_path)
+
+    return quantized_path
+
+
+class OnnxSentimentClassifier:
+    '''
+    Классификатор тональности на onnxruntime (CPU, int8)
+    Возвращает тот же формат, что и pipeline: [{'label': 'POSITIVE', 'score': 0.97}, ...]
+    '''
+    def __init__(self, model=MODEL_NAME, directory=ONNX_DIR):
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        self.labels = AutoConfig.from_pretrained(model).id2label
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(export(model, directory), options, providers=['CPUExecutionProvider'])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def __call__(self, texts, batch_size=BATCH_SIZE, truncation=True):
+        if isinstance(texts, str):
+            texts = [texts]
+
+        results = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            encoded = self.tokenizer(batch, padding=True, truncation=truncation, max_length=MAX_LENGTH, return_tensors='np')
+            inputs = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+
+            logits = self.session.run(None, inputs)[0]
+            probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+            for row in probabilities:
+                index = int(row.argmax())
+                results.append({'label': self.labels[index], 'score': float(row[index])})
+
+        return results
+
+
+def parity(texts, model=MODEL_NAME):
+    '''
+    Доля совпадающих меток у torch и onnx классификаторов
+    '''
+    texts = list(texts)
+    if not texts:
+        return 1.0
+
+    torch_results = get_classifier(model, 'torch')(texts, batch_size=BATCH_SIZE, truncation=True)
+    onnx_results = get_classifier(model, 'onnx')(texts, batch_size=BATCH_SIZE, truncation=True)
+
+    agreement = sum(1 for a, b in zip(torch_results, onnx_results) if a['label'] == b['label'])
+    return agreement / len(texts)
+
+
+if __name__ == '__main__':
+    file_path = os.path.join(os.getcwd(), 'data/data.json')
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+
+    texts = sorted({reply['text'] for group in data for network in ('vk', 'tg') for item in group.get(network, [])
+                    for post in item['posts'] for reply in post['replies'] if reply['text']})
+
+    print('texts: %d, label agreement: %.4f' % (len(texts), parity(texts)))
@@ -0,0 +1,48 @@
+import heapq
+from itertools import count
+
+
+def top_k(iterable, k, key=None):
+    '''
+    k наибольших элементов по убыванию key за O(n log k) - то же, что sorted(iterable, key=key, reverse=True)[:k]
+    При равных значениях раньше идет элемент, встреченный раньше
+    '''
+    return heapq.nlargest(k, iterable, key=key)
+
+
+def top_items(mapping, k):
+    '''
+    k пар (ключ, значение) словаря с наибольшими значениями {722219350: 0.04746, ...} -> [(722219350, 0.04746), ...]
+    '''
+    return heapq.nlargest(k, mapping.items(), key=lambda x: x[1])
+
+
+class TopK:
+    '''
+    Топ-k для потока элементов: элементы добавляются по одному (push) или пачкой (extend), в памяти только k элементов
+    items() - текущий топ в том же порядке, что и top_k
+    '''
+    def __init__(self, k, key=None):
+        self.k = k
+        self.key = key
+        self.__heap = []
+        self.__count = count()
+
+    def push(self, item):
+        self.extend((item,))
+
+    def extend(self, iterable):
+        heap, k, key = self.__heap, self.k, self.key
+        for item in iterable:
+            value = item if key is None else key(item)
+            if len(heap) < k:
+                # (значение, -номер): при равных значениях вытесняется элемент, пришедший позже
+                heapq.heappush(heap, (value, -next(self.__count), item))
+            elif heap and value > heap[0][0]:
+                heapq.heapreplace(heap, (value, -next(self.__count), item))
+
+    def items(self):
+        return [entry[2] for entry in sorted(self.__heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def __len__(self):
+        return len(self.__heap)
@@ -0,0 +1,43 @@
+'''
+Форматы хранения кейса (crawl_codec): размер значения, время записи и чтения для каждого формата и сжатия
+
+python benchmarks/codecs.py [число постов]
+'''
+import io
+import json
+import sys
+import time
+import synthetic  # добавляет корень репозитория и api/ в sys.path
+from crawl_codec import COMPRESSIONS, FORMATS, decode, encode, read_crawl
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    posts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    crawl = synthetic.make_crawl(posts=posts)
+
+    # старый формат: json.dumps с \uXXXX вместо кириллицы
+    legacy = json.dumps(crawl).encode('utf-8')
+    elapsed, _ = timed(lambda: json.loads(legacy))
+    print('постов: %d' % posts)
+    print('%-18s %10s %10s %10s %10s' % ('формат', 'MB', 'запись, s', 'чтение, s', 'поток, s'))
+    print('%-18s %10.1f %10s %10.3f %10s' % ('json (старый)', len(legacy) / 2 ** 20, '-', elapsed, '-'))
+
+    for format in FORMATS:
+        for compression in COMPRESSIONS:
+            name = '%s/%s' % (format, compression)
+            try:
+                encoding, payload = timed(lambda: encode(crawl, format, compression))
+            except ImportError as e:
+                print('%-18s нет модуля %s' % (name, e.name))
+                continue
+            decoding, result = timed(lambda: decode(payload))
+            assert result == crawl
+            streaming, result = timed(lambda: read_crawl(io.BytesIO(payload)))
+            assert result == crawl
+            print('%-18s %10.1f %10.3f %10.3f %10.3f' % (name, len(payload) / 2 ** 20, encoding, decoding, streaming))
@@ -0,0 +1,50 @@
+'''
+Чтение кейса: json.loads всего текста против потокового разбора (crawl_stream) - время и пик памяти
+
+python benchmarks/ingestion.py [число постов]
+'''
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import synthetic  # добавляет корень репозитория и api/ в sys.path
+from crawl_stream import load_columns, load_crawl
+
+
+def measured(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def read_json(path):
+    with open(path, 'r') as file:
+        return json.loads(file.read())
+
+
+def read_stream(load, path):
+    with open(path, 'rb') as file:
+        return load(file)
+
+
+if __name__ == '__main__':
+    posts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'crawl.json')
+        with open(path, 'w') as file:
+            json.dump(synthetic.make_crawl(posts=posts), file)
+        size = os.path.getsize(path)
+
+        print('постов: %d, размер кейса: %.1f MB' % (posts, size / 2 ** 20))
+        for name, function in (('json.loads', lambda: read_json(path)),
+                               ('load_crawl', lambda: read_stream(load_crawl, path)),
+                               ('load_columns', lambda: read_stream(load_columns, path))):
+            elapsed, peak, result = measured(function)
+            del result
+            print('%-14s %8.3f s   пик памяти %8.1f MB' % (name, elapsed, peak / 2 ** 20))
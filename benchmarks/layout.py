@@ -0,0 +1,36 @@
+'''
+Стоимость ранжирования и раскладки большого графа (окрестность топ-авторов и весь граф)
+
+python benchmarks/layout.py [число пользователей] [--full]
+'''
+import sys
+import time
+from synthetic import make_crawl
+from graph import InteractionGraph
+from graph_layout import neighbourhood
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    users = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 50000
+    data = make_crawl(users=users, posts=users // 10)
+
+    graph = InteractionGraph(data)
+    build = timed(lambda: graph.G)
+    ranking = timed(graph.pagerank)
+    print('узлов: %d, ребер: %d' % (graph.G.number_of_nodes(), graph.G.number_of_edges()))
+    print('построение графа:          %8.2f s' % build)
+    print('pagerank (без раскладки):  %8.2f s' % ranking)
+
+    nodes = neighbourhood(graph.G, graph.pagerank(), 10)
+    layout = timed(lambda: graph.layout(nodes))
+    print('раскладка, топ-10 и окрестность (%d узлов): %8.2f s' % (len(nodes), layout))
+
+    if '--full' in sys.argv:
+        layout = timed(graph.layout)
+        print('spring_layout, весь граф: %8.2f s' % layout)
@@ -0,0 +1,42 @@
+'''
+Полный расчет PageRank против инкрементального после повторного краулинга (небольшая доля новых ребер)
+
+python benchmarks/pagerank.py [число пользователей] [доля новых ребер]
+'''
+import random
+import sys
+import time
+from synthetic import make_crawl
+from graph import InteractionGraph
+from pagerank import IncrementalPageRank, apply_delta
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    graph = InteractionGraph(make_crawl(users=users, posts=users // 10))
+    ranker = IncrementalPageRank(graph.sender_id, graph.connections)
+    ranker.ranks()
+
+    rng = random.Random(1)
+    edges = graph.connections
+    added = [(rng.choice(edges)[0], rng.randrange(users)) for _ in range(int(len(edges) * share))]
+    removed = rng.sample(edges, int(len(edges) * share))
+    changed = apply_delta(edges, added, removed)
+    nodes = list(dict.fromkeys(node for edge in changed for node in edge))
+
+    # полный расчет - новый ranker по всем ребрам с равномерного начального вектора
+    full, expected = timed(lambda: IncrementalPageRank(nodes, changed).ranks())
+    incremental, result = timed(lambda: ranker.update(added, removed))
+    error = max(abs(result[node] - expected[node]) for node in expected)
+
+    print('ребер: %d, добавлено: %d, удалено: %d' % (len(edges), len(added), len(removed)))
+    print('полный расчет:        %8.3f s' % full)
+    print('инкрементальный:      %8.3f s (итераций: %d)' % (incremental, ranker.iterations))
+    print('макс. расхождение:    %8.1e' % error)
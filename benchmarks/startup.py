@@ -0,0 +1,71 @@
+'''
+Время холодного старта и потребление памяти при импорте модулей каждого эндпоинта
+Каждый замер выполняется в отдельном процессе интерпретатора
+
+python benchmarks/startup.py
+'''
+import json
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+
+ENDPOINTS = {
+    'python (пустой процесс)': [],
+    '/post_involvement_analysis': ['functions', 'annotation', 'api_redis'],
+    '/influencers_analysis': ['influencers_functions', 'annotation', 'api_redis'],
+    '/brand_rating': ['model_functions', 'annotation', 'api_redis'],
+    'api.py (все эндпоинты)': ['api'],
+    'api.py, CENTRALITY_WORKERS=4': ['api'],
+}
+
+# переменные окружения замера (пул процессов betweenness запускается при старте API, только если включен)
+ENVIRONMENTS = {
+    'api.py, CENTRALITY_WORKERS=4': {'CENTRALITY_WORKERS': '4'},
+}
+
+HEAVY_MODULES = ['transformers', 'torch', 'networkx', 'matplotlib', 'scipy', 'numpy']
+
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+for name in %r:
+    __import__(name)
+elapsed = time.perf_counter() - start
+# дочерние процессы (пул betweenness) и их текущий RSS
+children = sys.modules['multiprocessing'].active_children() if 'multiprocessing' in sys.modules else []
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [name for name in %r if name in sys.modules],
+    'children': len(children),
+    'children_rss_mb': sum(int(open('/proc/%%d/statm' %% child.pid).read().split()[1]) for child in children)
+                       * resource.getpagesize() / 2 ** 20,
+}))
+'''
+
+
+def measure(modules, environment=None, repeat=3):
+    '''
+    Лучшее из repeat время импорта, пиковый RSS процесса, число дочерних процессов и их RSS
+    '''
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', PROBE % (modules, HEAVY_MODULES)], cwd=API_DIR,
+                                capture_output=True, text=True, env=dict(os.environ, **(environment or {})))
+        if output.returncode != 0:
+            return {'error': output.stderr.strip().splitlines()[-1]}
+        runs.append(json.loads(output.stdout))
+    return min(runs, key=lambda x: x['seconds'])
+
+
+if __name__ == '__main__':
+    for endpoint, modules in ENDPOINTS.items():
+        result = measure(modules, ENVIRONMENTS.get(endpoint))
+        if 'error' in result:
+            print('%-30s %s' % (endpoint, result['error']))
+        else:
+            print('%-30s %7.3f s %8.1f MB  процессов пула: %d (%.1f MB)  загружены: %s' % (
+                endpoint, result['seconds'], result['rss_mb'], result['children'], result['children_rss_mb'],
+                ', '.join(result['heavy']) or '-'))
@@ -0,0 +1,46 @@
+'''
+Синтетический кейс краулинга в формате data/new_data.txt для бенчмарков
+'''
+import os
+import random
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+TEXTS = ['👍', 'Спасибо!', 'Очень вкусно, беру каждую неделю', 'Ужасное качество, больше не куплю',
+         'Подскажите, а где это продается? В нашем магазине не нашла, хотя искала несколько раз',
+         'Длинный отзыв о продукте. ' * 12]
+
+
+def make_crawl(users=50000, posts=5000, replies_per_post=20, seed=0):
+    '''
+    Кейс с users пользователями, posts постами и в среднем replies_per_post комментариями на пост
+    Авторы постов выбираются из небольшой группы активных пользователей, поэтому граф получается звездообразным
+    '''
+    rng = random.Random(seed)
+    authors = max(1, users // 100)
+    start = 1717189200  # 01/06/2024
+
+    def user(user_id):
+        return {'id': user_id, 'first_name': 'Имя%d' % user_id, 'last_name': 'Фамилия%d' % user_id,
+                'bdate': None, 'sex': 1, 'city': 'Москва', 'is_member': user_id % 2}
+
+    crawl_posts = []
+    for post_id in range(posts):
+        date = start + rng.randrange(30 * 86400)
+        replies = []
+        for _ in range(rng.randint(0, 2 * replies_per_post)):
+            sender_id = rng.randrange(users)
+            replies.append({'text': rng.choice(TEXTS), 'sender_id': sender_id, 'date': date + rng.randrange(86400),
+                            'reactions': [{'emoji': 'like', 'count': rng.randrange(5)}], 'replies': 0,
+                            'sender_name': 'Имя%d' % sender_id, 'last_name': 'Фамилия%d' % sender_id,
+                            'sex': 1, 'city': 'Москва', 'bdate': None})
+
+        crawl_posts.append({'id': post_id, 'from': user(rng.randrange(authors)), 'text': rng.choice(TEXTS),
+                            'views': rng.randrange(100, 10000), 'forwards': rng.randrange(10), 'replies': replies,
+                            'date': date, 'reactions': [{'emoji': 'like', 'count': rng.randrange(100)}]})
+
+    return {'vk': [{'groupId': '1', 'posts': crawl_posts, 'membersCount': users, 'membersIds': [],
+                    'crawlingTitle': 'benchmark', 'from': '01/06/2024', 'to': '30/06/2024', 'groupName': 'Бренд'}]}
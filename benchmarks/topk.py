@@ -0,0 +1,39 @@
+'''
+Выбор топ-k: полная сортировка против кучи (topk.top_k) и потокового TopK
+
+python benchmarks/topk.py [число элементов] [k]
+'''
+import random
+import sys
+import time
+import synthetic  # добавляет корень репозитория и api/ в sys.path
+from topk import TopK, top_items, top_k
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rng = random.Random(0)
+    values = {i: rng.random() for i in range(n)}
+
+    full, expected = timed(lambda: sorted(values.items(), key=lambda x: x[1], reverse=True)[:k])
+    heap, result = timed(lambda: top_items(values, k))
+    assert result == expected
+
+    def stream():
+        top = TopK(k, key=lambda x: x[1])
+        top.extend(values.items())
+        return top.items()
+    streaming, result = timed(stream)
+    assert result == expected
+
+    print('элементов: %d, k: %d' % (n, k))
+    print('sorted(...)[:k]:  %8.3f s' % full)
+    print('top_k (куча):     %8.3f s' % heap)
+    print('TopK (поток):     %8.3f s' % streaming)